@@ -8,9 +8,11 @@ Uses secure password hashing and JWT tokens for API calls.
 import hashlib
 import json
 import logging
+import queue
 import secrets
+import threading
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional
 
 import streamlit as st
 from sqlalchemy import text
@@ -18,6 +20,20 @@ from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
+AUDIT_INSERT = text("""
+    INSERT INTO audit_log (user_id, action, entity_type, entity_id, details, ip_address)
+    VALUES (:user_id, :action, :entity_type, :entity_id, :details, :ip)
+""")
+
+# Max queued audit events written per INSERT batch by the background writer
+AUDIT_BATCH_SIZE = 50
+
+# Background audit writer state (module-level so it survives Streamlit reruns)
+_audit_queue: "queue.Queue[dict]" = queue.Queue()
+_audit_worker_lock = threading.Lock()
+_audit_worker: Optional[threading.Thread] = None
+_audit_session_factory: Optional[Callable[[], Session]] = None
+
 
 class AuthManager:
     """Handles user authentication and session management."""
@@ -398,18 +414,8 @@ class AuditLog:
         """
         try:
             session.execute(
-                text("""
-                    INSERT INTO audit_log (user_id, action, entity_type, entity_id, details, ip_address)
-                    VALUES (:user_id, :action, :entity_type, :entity_id, :details, :ip)
-                """),
-                {
-                    "user_id": user_id,
-                    "action": action,
-                    "entity_type": entity_type,
-                    "entity_id": entity_id,
-                    "details": json.dumps(details) if details else None,
-                    "ip": ip_address
-                }
+                AUDIT_INSERT,
+                AuditLog._params(user_id, action, entity_type, entity_id, details, ip_address)
             )
             session.commit()
             logger.debug(f"Audit log: {action} on {entity_type}:{entity_id} by user {user_id}")
@@ -417,6 +423,84 @@ class AuditLog:
             session.rollback()
             logger.error(f"Audit logging failed: {str(e)}")
 
+    @staticmethod
+    def log_action_async(
+        session_factory: Callable[[], Session],
+        user_id: int,
+        action: str,
+        entity_type: str = None,
+        entity_id: int = None,
+        details: dict = None,
+        ip_address: str = None
+    ):
+        """
+        Queue an action for the background audit writer and return immediately.
+
+        Events are inserted in batches on a daemon thread using sessions from
+        the most recently supplied session_factory, so the caller does not
+        wait on the audit INSERT.
+
+        Args:
+            session_factory: Callable returning a new database session (e.g. db.get_session)
+            user_id: Who performed the action
+            action: What was done (insert, update, delete, login, logout, export, download)
+            entity_type: Type of entity affected (invoice, user, settings)
+            entity_id: ID of specific entity
+            details: Additional details (old/new values, etc.)
+            ip_address: Client IP address
+        """
+        global _audit_worker, _audit_session_factory
+        with _audit_worker_lock:
+            _audit_session_factory = session_factory
+            if _audit_worker is None or not _audit_worker.is_alive():
+                _audit_worker = threading.Thread(
+                    target=AuditLog._drain_queue,
+                    name="audit-log-writer",
+                    daemon=True,
+                )
+                _audit_worker.start()
+
+        _audit_queue.put(AuditLog._params(user_id, action, entity_type, entity_id, details, ip_address))
+
+    @staticmethod
+    def _params(user_id, action, entity_type, entity_id, details, ip_address) -> dict:
+        """Bind parameters for AUDIT_INSERT."""
+        return {
+            "user_id": user_id,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "details": json.dumps(details) if details else None,
+            "ip": ip_address
+        }
+
+    @staticmethod
+    def _drain_queue():
+        """Background writer loop: insert queued audit events in batches."""
+        while True:
+            batch = [_audit_queue.get()]
+            while len(batch) < AUDIT_BATCH_SIZE:
+                try:
+                    batch.append(_audit_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            session = None
+            try:
+                session = _audit_session_factory()
+                session.execute(AUDIT_INSERT, batch)
+                session.commit()
+                logger.debug(f"Audit log: wrote {len(batch)} queued events")
+            except Exception as e:
+                if session is not None:
+                    session.rollback()
+                logger.error(f"Audit logging failed for {len(batch)} queued events: {str(e)}")
+            finally:
+                if session is not None:
+                    session.close()
+                for _ in batch:
+                    _audit_queue.task_done()
+
     @staticmethod
     def get_audit_trail(
         session: Session,
@@ -438,14 +522,15 @@ class AuditLog:
             entity_type: Filter by entity type
 
         Returns:
-            List of audit log entries
+            List of audit log entries (created_at pre-formatted as
+            'YYYY-MM-DD HH24:MI:SS' text, which also sorts chronologically)
         """
         try:
             # Build dynamic query with filters
             query = """
                 SELECT
                     al.id,
-                    al.created_at,
+                    to_char(al.created_at, 'YYYY-MM-DD HH24:MI:SS') as created_at,
                     u.email,
                     u.full_name,
                     al.action,
@@ -6,13 +6,15 @@ Uses Streamlit secrets for credential management.
 Includes optimized bulk insert using PostgreSQL COPY command.
 """
 
+import csv
 import io
 import logging
 import time
 import uuid
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
 from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import Engine
@@ -21,6 +23,21 @@ from sqlalchemy.pool import QueuePool
 
 logger = logging.getLogger(__name__)
 
+# Display column names for rows returned by get_all_invoices
+INVOICE_COLUMNS = [
+    "ID", "Invoice #", "Vendor", "Date", "Amount",
+    "Category", "Source", "File", "Confidence", "Ingested", "Created By", "Type"
+]
+INVOICE_COLUMNS_WITH_DELETED = INVOICE_COLUMNS + ["Is Deleted", "Deleted At", "Deletion Reason"]
+
+# Numeric columns cast to float64 (Postgres DECIMAL arrives as decimal.Decimal)
+FLOAT_COLUMNS = ("Amount", "Confidence")
+
+# Text columns pinned to Arrow string so an all-NULL page is not typed as null[pyarrow]
+STRING_COLUMNS = (
+    "Invoice #", "Vendor", "Category", "Source", "File", "Created By", "Type", "Deletion Reason"
+)
+
 
 # Query performance monitoring
 @event.listens_for(Engine, "before_cursor_execute")
@@ -39,6 +56,130 @@ def receive_after_cursor_execute(conn, cursor, statement, parameters, context, e
             logger.warning(f"SLOW QUERY ({total_time:.3f}s): {statement[:100]}...")
 
 
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _invoice_filter_clause(
+    vendor: str = None,
+    category: str = None,
+    source: str = None,
+    date_from=None,
+    date_to=None,
+    min_amount: float = None,
+    max_amount: float = None,
+    search_text: str = None,
+    is_deleted: Optional[bool] = False,
+) -> tuple:
+    """
+    Build the WHERE clause and bind parameters for the invoice search filters.
+
+    Args:
+        vendor: Exact vendor name
+        category: Exact category
+        source: Exact source_type
+        date_from: Earliest invoice_date (inclusive)
+        date_to: Latest invoice_date (inclusive)
+        min_amount: Smallest amount (inclusive)
+        max_amount: Largest amount (inclusive)
+        search_text: Case-insensitive substring of invoice_number or vendor_name
+        is_deleted: Only active (False) or deleted (True) rows; None for both
+
+    Returns:
+        (where_clause, params) - where_clause is "" when there are no filters
+    """
+    conditions = []
+    params = {}
+    if is_deleted is not None:
+        conditions.append("is_deleted = :is_deleted")
+        params["is_deleted"] = is_deleted
+    if vendor:
+        conditions.append("vendor_name = :vendor")
+        params["vendor"] = vendor
+    if category:
+        conditions.append("category = :category")
+        params["category"] = category
+    if source:
+        conditions.append("source_type = :source")
+        params["source"] = source
+    if date_from:
+        conditions.append("invoice_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to:
+        conditions.append("invoice_date <= :date_to")
+        params["date_to"] = date_to
+    if min_amount is not None:
+        conditions.append("amount >= :min_amount")
+        params["min_amount"] = min_amount
+    if max_amount is not None:
+        conditions.append("amount <= :max_amount")
+        params["max_amount"] = max_amount
+    if search_text:
+        # lower(...) LIKE matches the trigram GIN indexes on lower(invoice_number)/lower(vendor_name)
+        conditions.append("(lower(invoice_number) LIKE :search OR lower(vendor_name) LIKE :search)")
+        params["search"] = f"%{_escape_like(search_text.lower())}%"
+
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where_clause, params
+
+
+def _rows_to_arrow_frame(rows: list, column_names: list) -> pd.DataFrame:
+    """
+    Convert result rows to an Arrow-backed DataFrame.
+
+    Rows are transposed into column arrays and handed to pyarrow once,
+    avoiding pandas' row-wise object construction.
+    """
+    if not rows:
+        return pd.DataFrame(columns=column_names)
+
+    columns = list(zip(*rows))
+    arrays = {}
+    for i, name in enumerate(column_names):
+        array = pa.array(columns[i])
+        if name in FLOAT_COLUMNS:
+            array = array.cast(pa.float64())
+        elif name in STRING_COLUMNS:
+            array = array.cast(pa.string())
+        arrays[name] = array
+
+    return pa.table(arrays).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+class _CopyStream(io.TextIOBase):
+    """
+    Read-only text stream over an iterator of CSV lines, for COPY ... FROM STDIN.
+
+    Lines are pulled only as the driver asks for the next chunk, so the full
+    payload is never materialized in memory.
+    """
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        parts = [self._buffer]
+        buffered = len(self._buffer)
+        while size < 0 or buffered < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            parts.append(line)
+            buffered += len(line)
+
+        data = "".join(parts)
+        if size < 0:
+            self._buffer = ""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
 class DatabaseManager:
     """
     Manages all database connections and operations.
@@ -81,12 +222,14 @@ class DatabaseManager:
         # pool_size: max 5 concurrent connections
         # max_overflow: allow 10 extra connections if needed
         # pool_recycle: recycle connections every 3600 seconds (AWS RDS timeout)
+        # pool_pre_ping: validate pooled connections before reuse (sessions are long-lived)
         self.engine = create_engine(
             self.connection_string,
             poolclass=QueuePool,
             pool_size=5,
             max_overflow=10,
             pool_recycle=3600,
+            pool_pre_ping=True,
             echo=False,  # Set True to see SQL queries (debug only)
         )
 
@@ -305,6 +448,70 @@ class DatabaseManager:
             logger.error(f"Bulk COPY operation failed: {str(e)}")
             return 0
 
+    def save_bulk_invoices_iter(
+        self, session: Session, rows: Iterable[tuple], source_type: str,
+        source_file: str = "bulk_upload", transaction_type: str = None
+    ) -> int:
+        """
+        STREAMING: COPY rows from any iterable without building a DataFrame or CSV buffer.
+
+        Args:
+            session: SQLAlchemy session
+            rows: Iterable of (date, vendor, amount, category) tuples; may be a generator
+            source_type: 'excel_bulk', 'pdf_scan', etc.
+            source_file: Original filename
+            transaction_type: 'INCOME' or 'EXPENSE' (optional)
+
+        Returns:
+            Number of rows inserted
+        """
+        inserted_count = 0
+        ingested_at = pd.Timestamp.now().isoformat()
+
+        def csv_lines() -> Iterator[str]:
+            nonlocal inserted_count
+            line = io.StringIO()
+            writer = csv.writer(line, lineterminator="\n")
+            for invoice_date, vendor, amount, category in rows:
+                writer.writerow((
+                    f"AUTO-{uuid.uuid4().hex[:8]}", vendor, invoice_date, amount, category,
+                    source_type, source_file, "streamlit_user", ingested_at, transaction_type,
+                ))
+                inserted_count += 1
+                yield line.getvalue()
+                line.seek(0)
+                line.truncate()
+
+        try:
+            raw_connection = session.connection().connection
+            cursor = raw_connection.cursor()
+
+            try:
+                cursor.copy_expert(
+                    """
+                    COPY invoices
+                    (invoice_number, vendor_name, invoice_date, amount, category,
+                     source_type, source_file, created_by, ingested_at, transaction_type)
+                    FROM STDIN WITH (FORMAT csv)
+                    """,
+                    _CopyStream(csv_lines()),
+                )
+                raw_connection.commit()
+
+                logger.info(f"COPY streamed {inserted_count} rows from {source_type}")
+                return inserted_count
+
+            except Exception as e:
+                raw_connection.rollback()
+                logger.error(f"Streaming COPY failed: {str(e)}")
+                raise
+            finally:
+                cursor.close()
+
+        except Exception as e:
+            logger.error(f"Streaming COPY operation failed: {str(e)}")
+            return 0
+
     def save_bulk_invoices_mixed(
         self, session: Session, invoices_df: pd.DataFrame, source_type: str,
         source_file: str = "bulk_upload", transaction_type: str = None
@@ -376,6 +583,251 @@ class DatabaseManager:
             logger.error(f"Failed to retrieve invoices: {str(e)}")
             return []
 
+    def search_invoices(
+        self,
+        session: Session,
+        vendor: str = None,
+        category: str = None,
+        date_from=None,
+        date_to=None,
+        limit: int = 100,
+        offset: int = 0,
+        include_deleted: bool = False,
+        source: str = None,
+        min_amount: float = None,
+        max_amount: float = None,
+        search_text: str = None,
+    ) -> pd.DataFrame:
+        """
+        Search invoices with the filters applied in SQL.
+
+        Vendor, category and source are matched exactly (served by
+        idx_invoices_vendor_date, idx_invoices_category and
+        idx_invoices_source_type); dates and amounts are inclusive bounds;
+        search_text is a case-insensitive substring of invoice number or vendor.
+
+        Args:
+            session: SQLAlchemy session
+            vendor: Exact vendor name, or None for all vendors
+            category: Exact category, or None for all categories
+            date_from: Earliest invoice_date to include
+            date_to: Latest invoice_date to include
+            limit: Max number of records to return
+            offset: Number of records to skip (newest first)
+            include_deleted: If True, include soft-deleted records (admin only)
+            source: Exact source_type, or None for all sources
+            min_amount: Smallest amount to include
+            max_amount: Largest amount to include
+            search_text: Text to find in invoice_number or vendor_name
+
+        Returns:
+            Arrow-backed DataFrame with INVOICE_COLUMNS (or INVOICE_COLUMNS_WITH_DELETED)
+        """
+        column_names = INVOICE_COLUMNS_WITH_DELETED if include_deleted else INVOICE_COLUMNS
+        select_list = """
+            id, invoice_number, vendor_name, invoice_date, amount,
+            category, source_type, source_file, extraction_confidence,
+            ingested_at, created_by, transaction_type
+        """
+        if include_deleted:
+            select_list += ", is_deleted, deleted_at, deletion_reason"
+
+        where_clause, params = _invoice_filter_clause(
+            vendor=vendor,
+            category=category,
+            source=source,
+            date_from=date_from,
+            date_to=date_to,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            search_text=search_text,
+            is_deleted=None if include_deleted else False,
+        )
+        params.update({"limit": limit, "offset": offset})
+
+        try:
+            query = text(f"""
+                SELECT {select_list}
+                FROM invoices
+                {where_clause}
+                ORDER BY ingested_at DESC, id DESC
+                LIMIT :limit OFFSET :offset
+            """)
+            rows = session.execute(query, params).fetchall()
+            logger.info(f"Search returned {len(rows)} invoices")
+        except Exception as e:
+            logger.error(f"Failed to search invoices: {str(e)}")
+            rows = []
+        return _rows_to_arrow_frame(rows, column_names)
+
+    def get_search_summary(self, session: Session, filters: dict, include_deleted: bool = False) -> dict:
+        """
+        Aggregate every invoice matching the search filters, not just one page.
+
+        One GROUPING SETS scan returns the overall count, total, average and
+        distinct vendors plus the per-category and per-source breakdowns.
+
+        Args:
+            session: SQLAlchemy session
+            filters: Keyword arguments for _invoice_filter_clause (vendor, category,
+                source, date_from, date_to, min_amount, max_amount, search_text)
+            include_deleted: If True, include soft-deleted records (admin only)
+
+        Returns:
+            Dict with count, total, avg and unique_vendors, and by_category /
+            by_source lists of (key, total, count, avg) ordered by total descending
+        """
+        summary = {
+            "count": 0, "total": 0.0, "avg": 0.0, "unique_vendors": 0,
+            "by_category": [], "by_source": [],
+        }
+        where_clause, params = _invoice_filter_clause(
+            **filters, is_deleted=None if include_deleted else False
+        )
+        try:
+            query = text(f"""
+                SELECT
+                    GROUPING(category) as by_category,
+                    GROUPING(source_type) as by_source,
+                    category,
+                    source_type,
+                    COUNT(*),
+                    COALESCE(SUM(amount), 0),
+                    COALESCE(AVG(amount), 0),
+                    COUNT(DISTINCT vendor_name)
+                FROM invoices
+                {where_clause}
+                GROUP BY GROUPING SETS ((), (category), (source_type))
+                ORDER BY 6 DESC
+            """)
+            rows = session.execute(query, params).fetchall()
+        except Exception as e:
+            logger.error(f"Failed to summarize invoice search: {str(e)}")
+            return summary
+
+        for cat_rolled_up, src_rolled_up, category, source, count, total, avg, vendors in rows:
+            if cat_rolled_up and src_rolled_up:
+                summary.update(
+                    count=count, total=float(total), avg=float(avg), unique_vendors=vendors
+                )
+            elif not cat_rolled_up and category is not None:
+                summary["by_category"].append((category, float(total), count, float(avg)))
+            elif not src_rolled_up and source is not None:
+                summary["by_source"].append((source, float(total), count, float(avg)))
+        return summary
+
+    def get_active_ids(self, session: Session, filters: dict, limit: int = 500) -> list:
+        """
+        Get IDs of non-deleted invoices matching the search filters.
+
+        Args:
+            session: SQLAlchemy session
+            filters: Keyword arguments for _invoice_filter_clause (vendor, category,
+                source, date_from, date_to, min_amount, max_amount, search_text)
+            limit: Max number of IDs to return (newest first)
+
+        Returns:
+            List of invoice IDs
+        """
+        return self._get_filtered_ids(session, filters, limit, is_deleted=False)
+
+    def get_deleted_ids(self, session: Session, filters: dict, limit: int = 500) -> list:
+        """
+        Get IDs of soft-deleted invoices matching the search filters.
+
+        Args:
+            session: SQLAlchemy session
+            filters: Keyword arguments for _invoice_filter_clause
+            limit: Max number of IDs to return (newest first)
+
+        Returns:
+            List of invoice IDs
+        """
+        return self._get_filtered_ids(session, filters, limit, is_deleted=True)
+
+    def _get_filtered_ids(self, session: Session, filters: dict, limit: int, is_deleted: bool) -> list:
+        """Shared query for get_active_ids / get_deleted_ids."""
+        where_clause, params = _invoice_filter_clause(**filters, is_deleted=is_deleted)
+        params["limit"] = limit
+        try:
+            query = text(f"""
+                SELECT id
+                FROM invoices
+                {where_clause}
+                ORDER BY id DESC
+                LIMIT :limit
+            """)
+            return [row[0] for row in session.execute(query, params).fetchall()]
+        except Exception as e:
+            logger.error(f"Failed to get invoice IDs: {str(e)}")
+            return []
+
+    def get_invoice_by_id(self, session: Session, invoice_id: int) -> Optional[dict]:
+        """
+        Fetch the fields shown next to the delete/restore selectors for one invoice.
+
+        Returns:
+            Dict with id, vendor_name, amount, is_deleted, deleted_at and
+            deletion_reason, or None if not found
+        """
+        try:
+            query = text("""
+                SELECT id, vendor_name, amount, is_deleted, deleted_at, deletion_reason
+                FROM invoices
+                WHERE id = :invoice_id
+            """)
+            row = session.execute(query, {"invoice_id": invoice_id}).mappings().fetchone()
+            return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Failed to get invoice {invoice_id}: {str(e)}")
+            return None
+
+    def get_invoice_filter_options(self, session: Session, include_deleted: bool = False) -> dict:
+        """
+        Get the values needed to populate the invoice search filters.
+
+        Args:
+            session: SQLAlchemy session
+            include_deleted: If True, include soft-deleted records (admin only)
+
+        Returns:
+            Dict with sorted vendors, categories and sources lists, the
+            min/max invoice date and amount, and total_count
+        """
+        try:
+            query = text("""
+                SELECT
+                    array_agg(DISTINCT vendor_name ORDER BY vendor_name)
+                        FILTER (WHERE vendor_name IS NOT NULL) as vendors,
+                    array_agg(DISTINCT category ORDER BY category)
+                        FILTER (WHERE category IS NOT NULL AND category <> '') as categories,
+                    array_agg(DISTINCT source_type ORDER BY source_type)
+                        FILTER (WHERE source_type IS NOT NULL) as sources,
+                    MIN(invoice_date), MAX(invoice_date),
+                    MIN(amount), MAX(amount),
+                    COUNT(*)
+                FROM invoices
+                WHERE :include_deleted OR is_deleted = FALSE
+            """)
+            result = session.execute(query, {"include_deleted": include_deleted}).fetchone()
+            return {
+                "vendors": result[0] or [],
+                "categories": result[1] or [],
+                "sources": result[2] or [],
+                "min_date": result[3],
+                "max_date": result[4],
+                "min_amount": float(result[5] or 0),
+                "max_amount": float(result[6] or 0),
+                "total_count": result[7] or 0,
+            }
+        except Exception as e:
+            logger.error(f"Failed to get invoice filter options: {str(e)}")
+            return {
+                "vendors": [], "categories": [], "sources": [],
+                "min_date": None, "max_date": None,
+                "min_amount": 0.0, "max_amount": 0.0, "total_count": 0,
+            }
+
     def get_invoices_by_source(self, session: Session, source_type: str) -> list:
         """Fetch invoices by source type (pdf_scan, excel_bulk, manual_entry)."""
         try:
@@ -430,6 +882,34 @@ class DatabaseManager:
             logger.error(f"Failed to get total stats: {str(e)}")
             return {"total_count": 0, "total_amount": 0}
 
+    def get_windowed_metrics(self, session: Session) -> dict:
+        """
+        Get KPI metrics over recent time windows in a single query.
+
+        Returns:
+            Dict with week_count, month_amount, avg_amount and std_amount
+        """
+        try:
+            query = text("""
+                SELECT
+                    COUNT(*) FILTER (WHERE ingested_at > NOW() - INTERVAL '7 day') as week_count,
+                    COALESCE(SUM(amount) FILTER (WHERE ingested_at > NOW() - INTERVAL '30 day'), 0) as month_amount,
+                    COALESCE(AVG(amount), 0) as avg_amount,
+                    COALESCE(STDDEV_SAMP(amount), 0) as std_amount
+                FROM invoices
+                WHERE is_deleted = FALSE
+            """)
+            result = session.execute(query).fetchone()
+            return {
+                "week_count": result[0] or 0,
+                "month_amount": float(result[1] or 0),
+                "avg_amount": float(result[2] or 0),
+                "std_amount": float(result[3] or 0),
+            }
+        except Exception as e:
+            logger.error(f"Failed to get windowed metrics: {str(e)}")
+            return {"week_count": 0, "month_amount": 0, "avg_amount": 0, "std_amount": 0}
+
     # ============================================================
     # Soft Delete & Restore Methods
     # ============================================================
@@ -836,3 +1316,27 @@ def get_db_manager() -> Optional[DatabaseManager]:
     except Exception as e:
         st.error(f"Failed to initialize database: {str(e)}")
         return None
+
+
+def get_cached_session(db: DatabaseManager) -> Session:
+    """
+    Get the database session for the current browser session.
+
+    The Session is kept in st.session_state so reruns reuse it instead of
+    building a new one each time. It is not shared across users (Sessions
+    are not thread-safe). Call session.rollback() at the end of a run to
+    return the connection to the pool; do not close() it.
+
+    The session is rolled back before it is handed out, because a run can
+    end early (exception, st.rerun(), st.stop()) and skip that trailing
+    rollback. The read methods log and swallow query errors, so an aborted
+    transaction carried into the next run would otherwise make every later
+    query quietly return nothing.
+    """
+    session = st.session_state.get("_db_session")
+    if session is None:
+        session = db.get_session()
+        st.session_state["_db_session"] = session
+    else:
+        session.rollback()
+    return session
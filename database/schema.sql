@@ -62,6 +62,11 @@ CREATE INDEX idx_invoices_vendor_date ON invoices(vendor_name, invoice_date);
 -- Index on amount (for sum/aggregation queries)
 CREATE INDEX idx_invoices_amount ON invoices(amount);
 
+-- Trigram indexes for case-insensitive substring search (Invoice Details search box)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_invoices_invoice_number_trgm ON invoices USING GIN (lower(invoice_number) gin_trgm_ops);
+CREATE INDEX idx_invoices_vendor_name_trgm ON invoices USING GIN (lower(vendor_name) gin_trgm_ops);
+
 -- Create a view for "verified" data (PDFs with high confidence only)
 CREATE VIEW verified_invoices AS
 SELECT
@@ -273,3 +278,6 @@ CREATE TRIGGER update_users_updated_at
 --     ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP,
 --     ADD COLUMN IF NOT EXISTS deletion_reason TEXT;
 -- CREATE INDEX IF NOT EXISTS idx_invoices_transaction_type ON invoices(transaction_type);
+-- CREATE EXTENSION IF NOT EXISTS pg_trgm;
+-- CREATE INDEX IF NOT EXISTS idx_invoices_invoice_number_trgm ON invoices USING GIN (lower(invoice_number) gin_trgm_ops);
+-- CREATE INDEX IF NOT EXISTS idx_invoices_vendor_name_trgm ON invoices USING GIN (lower(vendor_name) gin_trgm_ops);
@@ -10,12 +10,25 @@ import json
 import logging
 import os
 import re
+import string
 import boto3
 from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, TypedDict
 from urllib.parse import unquote_plus
 
+# Optional linear-time regex engine (google-re2); falls back to the stdlib backtracking engine
+try:
+    import re2 as _re
+except ImportError:
+    _re = re
+
+# Optional fast JSON encoder; falls back to the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Database imports (psycopg2 from Lambda layer)
 try:
     import psycopg2
@@ -32,6 +45,9 @@ logger.setLevel(getattr(logging, log_level))
 # Environment variable defaults
 DEFAULT_ALLOWED_FORMATS = "pdf,jpg,jpeg,png"
 
+# Read once per container; Lambda environment variables are fixed for its lifetime
+_TEXTRACT_ENABLED = os.environ.get("TEXTRACT_ENABLED", "true").lower() == "true"
+
 # Lazy initialization of AWS clients (for testing support)
 _textract_client = None
 _s3_client = None
@@ -55,6 +71,15 @@ def _get_s3_client():
     return _s3_client
 
 
+def _json_dumps(obj: Any) -> str:
+    """Serialize to a JSON string, using str() for types JSON can't represent."""
+    if orjson is not None:
+        # Pass datetimes through to default=str so output matches json.dumps(default=str)
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        return orjson.dumps(obj, default=str, option=options).decode()
+    return json.dumps(obj, default=str)
+
+
 def _get_invoice_bucket() -> Optional[str]:
     """Get invoice bucket from environment."""
     return os.environ.get("INVOICE_BUCKET")
@@ -67,7 +92,7 @@ def _get_allowed_formats() -> List[str]:
 
 def _is_textract_enabled() -> bool:
     """Check if Textract processing is enabled."""
-    return os.environ.get("TEXTRACT_ENABLED", "true").lower() == "true"
+    return _TEXTRACT_ENABLED
 
 
 def _get_confidence_threshold() -> float:
@@ -123,7 +148,7 @@ def _get_db_connection():
         return None
 
 
-def _save_invoice_to_db(invoice_data: Dict[str, Any]) -> bool:
+def _save_invoice_to_db(invoice_data: "InvoiceRecord") -> bool:
     """
     Save extracted invoice data to PostgreSQL database.
 
@@ -204,7 +229,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     try:
         # Log incoming event
-        logger.info(f"Received event: {json.dumps(event)}")
+        logger.info(f"Received event: {_json_dumps(event)}")
 
         # Validate event structure
         if "Records" not in event or not event["Records"]:
@@ -306,7 +331,7 @@ def _process_record(record: Dict[str, Any]) -> Dict[str, Any]:
                 logger.info(f"Transaction type from S3 metadata: {transaction_type}")
 
         # Phase 3: Call Textract if enabled
-        invoice_data = None
+        invoice_data: Optional[InvoiceRecord] = None
         textract_result = None
 
         if _is_textract_enabled():
@@ -315,13 +340,15 @@ def _process_record(record: Dict[str, Any]) -> Dict[str, Any]:
 
             if textract_result.get("success"):
                 # Parse the Textract response into structured invoice data
-                invoice_data = _parse_textract_response(textract_result.get("response", {}))
-                invoice_data["source_file"] = key
-                invoice_data["source_type"] = "pdf_scan"
-                invoice_data["extraction_confidence"] = textract_result.get("avg_confidence", 0)
-                invoice_data["transaction_type"] = transaction_type  # Add classification from metadata
+                invoice_data = {
+                    **_parse_textract_response(textract_result.get("response", {})),
+                    "source_file": key,
+                    "source_type": "pdf_scan",
+                    "extraction_confidence": textract_result.get("avg_confidence", 0),
+                    "transaction_type": transaction_type,  # Add classification from metadata
+                }
 
-                logger.info(f"Extracted invoice data: {json.dumps(invoice_data, default=str)}")
+                logger.info(f"Extracted invoice data: {_json_dumps(invoice_data)}")
 
                 # Save to database
                 db_saved = _save_invoice_to_db(invoice_data)
@@ -381,22 +408,24 @@ def _call_textract(bucket: str, key: str) -> Dict[str, Any]:
             }
         )
 
-        # Calculate average confidence from LINE blocks
+        # Average confidence over LINE blocks in a single pass (no intermediate lists)
         blocks = response.get("Blocks", [])
-        line_blocks = [b for b in blocks if b.get("BlockType") == "LINE"]
+        line_count = 0
+        confidence_total = 0.0
+        for block in blocks:
+            if block.get("BlockType") == "LINE":
+                line_count += 1
+                confidence_total += block.get("Confidence", 0)
 
-        avg_confidence = 0.0
-        if line_blocks:
-            confidences = [b.get("Confidence", 0) for b in line_blocks]
-            avg_confidence = sum(confidences) / len(confidences)
+        avg_confidence = confidence_total / line_count if line_count else 0.0
 
-        logger.info(f"Textract returned {len(blocks)} blocks, {len(line_blocks)} lines, avg confidence: {avg_confidence:.2f}%")
+        logger.info(f"Textract returned {len(blocks)} blocks, {line_count} lines, avg confidence: {avg_confidence:.2f}%")
 
         return {
             "success": True,
             "response": response,
             "block_count": len(blocks),
-            "line_count": len(line_blocks),
+            "line_count": line_count,
             "avg_confidence": avg_confidence,
         }
 
@@ -408,7 +437,26 @@ def _call_textract(bucket: str, key: str) -> Dict[str, Any]:
         }
 
 
-def _parse_textract_response(response: Dict[str, Any]) -> Dict[str, Any]:
+class ParsedInvoice(TypedDict):
+    """Fields extracted from a Textract response by _parse_textract_response."""
+
+    invoice_number: str
+    vendor_name: str
+    invoice_date: str
+    amount: float
+    category: str
+
+
+class InvoiceRecord(ParsedInvoice, total=False):
+    """ParsedInvoice plus the source and classification fields _process_record adds."""
+
+    source_file: str
+    source_type: str
+    extraction_confidence: float
+    transaction_type: Optional[str]
+
+
+def _parse_textract_response(response: Dict[str, Any]) -> ParsedInvoice:
     """
     Parse Textract JSON response into structured invoice data.
 
@@ -425,7 +473,7 @@ def _parse_textract_response(response: Dict[str, Any]) -> Dict[str, Any]:
         response: Textract API response
 
     Returns:
-        dict with extracted invoice fields
+        ParsedInvoice dict with extracted invoice fields
     """
     blocks = response.get("Blocks", [])
 
@@ -435,19 +483,93 @@ def _parse_textract_response(response: Dict[str, Any]) -> Dict[str, Any]:
 
     logger.debug(f"Full extracted text: {full_text[:500]}...")
 
+    # Normalize and uppercase once; every search below reuses both strings
+    text, upper = _match_texts(full_text)
+
+    # One multi-pattern scan finds which extraction patterns can match at all
+    candidates = _matching_patterns(text, upper)
+
     # Extract fields using regex patterns
-    invoice_data = {
-        "invoice_number": _extract_invoice_number(full_text),
-        "vendor_name": _extract_vendor_name(full_text),
-        "invoice_date": _extract_date(full_text),
-        "amount": _extract_amount(full_text),
+    invoice_data: ParsedInvoice = {
+        "invoice_number": _extract_invoice_number(text, candidates, upper),
+        "vendor_name": _extract_vendor_name(text, candidates, upper),
+        "invoice_date": _extract_date(text, candidates, upper),
+        "amount": _extract_amount(text, candidates, upper),
         "category": "Other",  # Default category
     }
 
     return invoice_data
 
 
-def _extract_invoice_number(text: str) -> str:
+def _compile(pattern: str):
+    """
+    Compile with RE2 when available, falling back to re for syntax RE2 rejects.
+
+    The re fallback uses re.ASCII so \\w, \\d and \\s are the same ASCII-only
+    classes RE2 uses, without per-character Unicode property lookups. Non-ASCII
+    whitespace is mapped to spaces by _normalize_space before matching.
+    """
+    if _re is not re:
+        try:
+            return _re.compile(pattern)
+        except Exception:
+            pass
+    return re.compile(pattern, re.ASCII)
+
+
+# Fallback for _upper_aligned: uppercases ASCII letters only, preserving offsets
+_ASCII_UPPER = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
+# Whitespace that ASCII \s misses: the \x1c-\x1f separators plus every non-ASCII
+# space (NBSP, thin, narrow and ideographic spaces, ...) common in Textract output
+_UNICODE_SPACE_RE = _compile(
+    "[\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]"
+)
+
+
+def _normalize_space(text: str) -> str:
+    """Replace whitespace that ASCII \\s does not match with ASCII spaces."""
+    return _UNICODE_SPACE_RE.sub(" ", text)
+
+
+def _upper_aligned(text: str) -> str:
+    """Uppercase text, keeping len() and character offsets unchanged."""
+    upper = text.upper()
+    # A few characters (e.g. "ß" -> "SS") grow when uppercased and would shift
+    # every later offset; only then fall back to uppercasing ASCII letters alone
+    return upper if len(upper) == len(text) else text.translate(_ASCII_UPPER)
+
+
+def _match_texts(text: str) -> tuple:
+    """
+    Return (text, upper): whitespace-normalized text and its uppercase form.
+
+    Patterns search upper; captures are sliced from text at the same offsets.
+    """
+    text = _normalize_space(text)
+    return text, _upper_aligned(text)
+
+
+# Extraction patterns are compiled once at import and reused for every document.
+# They are written in uppercase and run case-sensitively against the upper half
+# of _match_texts(): IGNORECASE would disable the literal-prefix scan in the
+# stdlib engine. Captured values are sliced from the normalized text by span, so
+# their case is preserved. _parse_textract_response prepares both strings once;
+# the extractors only build them when called on raw text.
+_INVOICE_NUMBER_PATTERNS = tuple(
+    _compile(pattern)
+    for pattern in (
+        r"INVOICE\s*#?\s*:?\s*([A-Z0-9][\w-]*)",
+        r"INV[-#]?\s*([A-Z0-9][\w-]*)",
+        r"INVOICE\s+NUMBER\s*:?\s*([A-Z0-9][\w-]*)",
+        r"INVOICE\s+NO\.?\s*:?\s*([A-Z0-9][\w-]*)",
+    )
+)
+
+
+def _extract_invoice_number(
+    text: str, candidates: Optional[frozenset] = None, upper: Optional[str] = None
+) -> str:
     """
     Extract invoice number from text.
 
@@ -457,22 +579,31 @@ def _extract_invoice_number(text: str) -> str:
     - INV-12345
     - Invoice: ABC123
     """
-    patterns = [
-        r"Invoice\s*#?\s*:?\s*([A-Z0-9][\w-]*)",
-        r"INV[-#]?\s*([A-Z0-9][\w-]*)",
-        r"Invoice\s+Number\s*:?\s*([A-Z0-9][\w-]*)",
-        r"Invoice\s+No\.?\s*:?\s*([A-Z0-9][\w-]*)",
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    if upper is None:
+        text, upper = _match_texts(text)
+    for pattern in _INVOICE_NUMBER_PATTERNS:
+        if candidates is not None and pattern not in candidates:
+            continue
+        match = pattern.search(upper)
         if match:
-            return match.group(1).strip()
+            return text[match.start(1):match.end(1)].strip()
 
     return ""
 
 
-def _extract_vendor_name(text: str) -> str:
+_VENDOR_PATTERNS = tuple(
+    _compile(pattern)
+    for pattern in (
+        r"(?:VENDOR|FROM|BILL\s+FROM|SUPPLIER)\s*:?\s*([A-Z][A-Z0-9\s&.,'-]+?)(?:\n|$|INVOICE)",
+        r"(?:COMPANY|BUSINESS)\s*:?\s*([A-Z][A-Z0-9\s&.,'-]+?)(?:\n|$)",
+    )
+)
+_WHITESPACE_RE = _compile(r"\s+")
+
+
+def _extract_vendor_name(
+    text: str, candidates: Optional[frozenset] = None, upper: Optional[str] = None
+) -> str:
     """
     Extract vendor name from text.
 
@@ -482,24 +613,51 @@ def _extract_vendor_name(text: str) -> str:
     - Bill From: Acme Corp
     - Company Name
     """
-    patterns = [
-        r"(?:Vendor|From|Bill\s+From|Supplier)\s*:?\s*([A-Za-z][A-Za-z0-9\s&.,'-]+?)(?:\n|$|Invoice)",
-        r"(?:Company|Business)\s*:?\s*([A-Za-z][A-Za-z0-9\s&.,'-]+?)(?:\n|$)",
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    if upper is None:
+        text, upper = _match_texts(text)
+    for pattern in _VENDOR_PATTERNS:
+        if candidates is not None and pattern not in candidates:
+            continue
+        match = pattern.search(upper)
         if match:
-            vendor = match.group(1).strip()
+            vendor = text[match.start(1):match.end(1)].strip()
             # Clean up the vendor name
-            vendor = re.sub(r"\s+", " ", vendor)
+            vendor = _WHITESPACE_RE.sub(" ", vendor)
             if len(vendor) > 3:  # Minimum reasonable vendor name
                 return vendor[:255]  # Limit to DB column size
 
     return "Unknown Vendor"
 
 
-def _extract_date(text: str) -> str:
+_LABELLED_DATE_PATTERNS = tuple(
+    _compile(pattern)
+    for pattern in (
+        # MM/DD/YYYY or DD/MM/YYYY
+        r"(?:DATE|INVOICE\s+DATE|DATED?)\s*:?\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})",
+        # YYYY-MM-DD (ISO format)
+        r"(?:DATE|INVOICE\s+DATE|DATED?)\s*:?\s*(\d{4}[-/]\d{1,2}[-/]\d{1,2})",
+        # Month DD, YYYY
+        r"(?:DATE|INVOICE\s+DATE|DATED?)\s*:?\s*((?:JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)[A-Z]*\.?\s+\d{1,2},?\s+\d{4})",
+    )
+)
+_STANDALONE_DATE_PATTERNS = tuple(
+    _compile(pattern)
+    for pattern in (
+        # Standalone date patterns (fallback)
+        r"(\d{1,2}[-/]\d{1,2}[-/]\d{4})",
+        r"(\d{4}[-/]\d{1,2}[-/]\d{1,2})",
+    )
+)
+_DATE_PATTERNS = _LABELLED_DATE_PATTERNS + _STANDALONE_DATE_PATTERNS
+
+# Cheap literal checks that rule out whole groups of date patterns
+_DIGIT_RE = _compile(r"\d")
+_DATE_LABEL_RE = _compile(r"DATE")
+
+
+def _extract_date(
+    text: str, candidates: Optional[frozenset] = None, upper: Optional[str] = None
+) -> str:
     """
     Extract invoice date from text.
 
@@ -508,28 +666,41 @@ def _extract_date(text: str) -> str:
     - YYYY-MM-DD
     - Month DD, YYYY
     """
-    date_patterns = [
-        # MM/DD/YYYY or DD/MM/YYYY
-        r"(?:Date|Invoice\s+Date|Dated?)\s*:?\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})",
-        # YYYY-MM-DD (ISO format)
-        r"(?:Date|Invoice\s+Date|Dated?)\s*:?\s*(\d{4}[-/]\d{1,2}[-/]\d{1,2})",
-        # Month DD, YYYY
-        r"(?:Date|Invoice\s+Date|Dated?)\s*:?\s*((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4})",
-        # Standalone date patterns (fallback)
-        r"(\d{1,2}[-/]\d{1,2}[-/]\d{4})",
-        r"(\d{4}[-/]\d{1,2}[-/]\d{1,2})",
-    ]
+    if upper is None:
+        text, upper = _match_texts(text)
+    # Every date pattern needs a digit, and the labelled ones need the word "date"
+    if not _DIGIT_RE.search(text):
+        patterns = ()
+    elif _DATE_LABEL_RE.search(upper):
+        patterns = _DATE_PATTERNS
+    else:
+        patterns = _STANDALONE_DATE_PATTERNS
 
-    for pattern in date_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in patterns:
+        if candidates is not None and pattern not in candidates:
+            continue
+        match = pattern.search(upper)
         if match:
-            return match.group(1).strip()
+            return text[match.start(1):match.end(1)].strip()
 
     # Fallback to today's date
     return datetime.now().strftime("%Y-%m-%d")
 
 
-def _extract_amount(text: str) -> float:
+_AMOUNT_PATTERNS = tuple(
+    _compile(pattern)
+    for pattern in (
+        r"(?:TOTAL|AMOUNT\s+DUE|GRAND\s+TOTAL|BALANCE\s+DUE|TOTAL\s+AMOUNT)\s*:?\s*\$?\s*([\d,]+\.?\d*)",
+        r"(?:TOTAL|DUE)\s*:?\s*\$\s*([\d,]+\.?\d*)",
+        # Standalone currency amounts (last resort)
+        r"\$\s*([\d,]+\.\d{2})",
+    )
+)
+
+
+def _extract_amount(
+    text: str, candidates: Optional[frozenset] = None, upper: Optional[str] = None
+) -> float:
     """
     Extract total amount from text.
 
@@ -538,25 +709,69 @@ def _extract_amount(text: str) -> float:
     - Amount Due: $1234.56
     - Grand Total: 1,234.56
     """
-    amount_patterns = [
-        r"(?:Total|Amount\s+Due|Grand\s+Total|Balance\s+Due|Total\s+Amount)\s*:?\s*\$?\s*([\d,]+\.?\d*)",
-        r"(?:Total|Due)\s*:?\s*\$\s*([\d,]+\.?\d*)",
-        # Standalone currency amounts (last resort)
-        r"\$\s*([\d,]+\.\d{2})",
-    ]
-
-    for pattern in amount_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    if upper is None:
+        text, upper = _match_texts(text)
+    for pattern in _AMOUNT_PATTERNS:
+        if candidates is not None and pattern not in candidates:
+            continue
+        match = pattern.search(upper)
         if match:
-            amount_str = match.group(1).replace(",", "")
-            try:
-                return float(amount_str)
-            except ValueError:
-                continue
+            amount = _parse_money(match.group(1))
+            if amount is not None:
+                return amount
 
     return 0.0
 
 
+def _parse_money(value: str) -> Optional[float]:
+    """
+    Parse a matched amount such as '1,234.56'.
+
+    Returns None when the match holds no usable number (e.g. a lone ',').
+    str.replace + float run in C and beat a per-character Python loop.
+    """
+    try:
+        return float(value.replace(",", ""))
+    except ValueError:
+        return None
+
+
+# Every extraction pattern, searched together in one pass by _matching_patterns
+_ALL_PATTERNS = _INVOICE_NUMBER_PATTERNS + _VENDOR_PATTERNS + _DATE_PATTERNS + _AMOUNT_PATTERNS
+
+
+def _build_pattern_set():
+    """Compile all extraction patterns into one RE2 Set (None without google-re2)."""
+    if _re is re:
+        return None
+    try:
+        pattern_set = _re.Set.SearchSet()
+        for pattern in _ALL_PATTERNS:
+            pattern_set.Add(pattern.pattern)
+        pattern_set.Compile()
+        return pattern_set
+    except Exception as e:
+        logger.warning(f"RE2 pattern set unavailable, searching patterns individually: {e}")
+        return None
+
+
+_PATTERN_SET = _build_pattern_set()
+
+
+def _matching_patterns(text: str, upper: Optional[str] = None) -> Optional[frozenset]:
+    """
+    Return the extraction patterns that match somewhere in text.
+
+    Returns None (try every pattern) when no RE2 Set is available.
+    """
+    if _PATTERN_SET is None:
+        return None
+    if upper is None:
+        _, upper = _match_texts(text)
+    matched = _PATTERN_SET.Match(upper) or ()
+    return frozenset(_ALL_PATTERNS[i] for i in matched)
+
+
 def _response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generate Lambda response in standard format.
@@ -570,6 +785,6 @@ def _response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
     """
     return {
         "statusCode": status_code,
-        "body": json.dumps(body, default=str),
+        "body": _json_dumps(body),
         "headers": {"Content-Type": "application/json"},
     }
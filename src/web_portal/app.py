@@ -25,6 +25,8 @@ from database.auth import AuditLog
 
 # === CONFIGURATION ===
 REQUIRED_COLUMNS = ["Date", "Vendor", "Amount", "Category"]
+REQUIRED_COLUMN_SET = frozenset(REQUIRED_COLUMNS)  # O(1) membership for wide uploads
+REQUIRED_COLUMN_INDEX = pd.Index(REQUIRED_COLUMNS)  # isin() runs one hashed scan in C
 CATEGORIES = ["Inventory", "Utilities", "Rent", "Supplies", "Services", "Other"]
 
 # AWS config from Streamlit secrets (with fallbacks)
@@ -257,10 +259,11 @@ with tab_excel:
                 if uploaded_excel.name.endswith(".csv"):
                     df = pd.read_csv(uploaded_excel)
                 else:
-                    df = pd.read_excel(uploaded_excel)
+                    # calamine (Rust) streams the sheet instead of building an openpyxl DOM
+                    df = pd.read_excel(uploaded_excel, engine="calamine")
 
                 # Validation: Check columns
-                missing_cols = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+                missing_cols = REQUIRED_COLUMN_INDEX[~REQUIRED_COLUMN_INDEX.isin(df.columns)].tolist()
 
                 if missing_cols:
                     st.error(f"""
@@ -272,6 +275,10 @@ with tab_excel:
                     Please download the template above and use it as a guide.
                     """)
                 else:
+                    # Compute once; reused by the metrics, audit log and success message
+                    row_count = len(df)
+                    total_amount = float(df["Amount"].sum())
+
                     # Show preview
                     st.subheader("Preview of Data")
                     st.dataframe(df.head(10), use_container_width=True)
@@ -279,20 +286,20 @@ with tab_excel:
                     # Show statistics
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.metric("Rows to Import", len(df))
+                        st.metric("Rows to Import", row_count)
                     with col2:
-                        st.metric("Total Amount", f"${df['Amount'].sum():,.2f}")
+                        st.metric("Total Amount", f"${total_amount:,.2f}")
                     with col3:
                         st.metric("Categories", df["Category"].nunique())
 
                     # Check for extra columns
-                    extra_cols = [col for col in df.columns if col not in REQUIRED_COLUMNS]
+                    extra_cols = [col for col in df.columns if col not in REQUIRED_COLUMN_SET]
                     if extra_cols:
                         st.info(f"Note: Extra columns will be ignored: {', '.join(extra_cols)}")
 
                     # File info message for large uploads
-                    if len(df) >= 100:
-                        st.info(f"Large file ({len(df)} rows) - will use optimized bulk upload for faster processing.")
+                    if row_count >= 100:
+                        st.info(f"Large file ({row_count} rows) - will use optimized bulk upload for faster processing.")
 
                     # Save button
                     if st.button("Confirm & Save to Database", key="save_excel_btn"):
@@ -325,7 +332,7 @@ with tab_excel:
                                 details={
                                     "filename": uploaded_excel.name,
                                     "rows_imported": rows_saved,
-                                    "total_amount": float(df['Amount'].sum()),
+                                    "total_amount": total_amount,
                                     "transaction_type": excel_transaction_type
                                 }
                             )
@@ -336,7 +343,7 @@ with tab_excel:
 
                             Saved **{rows_saved} rows** to the database in {elapsed:.2f}s
                             Speed: ~{rows_per_sec:,} rows/sec
-                            Total amount imported: ${df['Amount'].sum():,.2f}
+                            Total amount imported: ${total_amount:,.2f}
 
                             Your data is now available in the Statistics tab.
                             """)
@@ -516,8 +523,6 @@ with tab_audit:
                 audit_entries,
                 columns=["ID", "Timestamp", "Email", "User Name", "Action", "Entity Type", "Entity ID", "Details", "IP Address"]
             )
-            # Format timestamp
-            audit_df["Timestamp"] = pd.to_datetime(audit_df["Timestamp"]).dt.strftime("%Y-%m-%d %H:%M:%S")
             st.dataframe(audit_df, use_container_width=True)
 
             # Export option
@@ -6,19 +6,114 @@ Available at: localhost:8501/Invoice_Details (Streamlit auto-creates navigation)
 Requires authentication to access (admin only via Streamlit secrets).
 """
 
+import io
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import streamlit as st
 
 # Add project root to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
-from database.database import get_db_manager
+from database.database import get_cached_session, get_db_manager
 from database.auth import AuditLog
 
+# Invoices fetched per "Load more" page
+PAGE_SIZE = 100
+
+# Max rows sent to the browser grid
+DISPLAY_ROW_LIMIT = 1000
+
+# Reuse memoized results for at most this long, matching the cached query TTLs
+RESULTS_MAX_AGE = timedelta(seconds=60)
+
+BREAKDOWN_COLUMN_CONFIG = {
+    "Total Amount": st.column_config.NumberColumn("Total Amount", format="$%.2f"),
+    "Avg Amount": st.column_config.NumberColumn("Avg Amount", format="$%.2f"),
+}
+
+
+# === CACHED QUERIES ===
+@st.cache_data(ttl=60, show_spinner=False)
+def _filter_options(_session, include_deleted: bool) -> dict:
+    """Filter widget values, computed once per data version instead of every rerun."""
+    return db.get_invoice_filter_options(_session, include_deleted=include_deleted)
+
+
+@st.cache_data(ttl=60, max_entries=4, show_spinner=False)
+def _to_csv_bytes(filter_key: tuple, _df: pd.DataFrame) -> bytes:
+    """CSV export of the filtered results, rebuilt only when filter_key changes."""
+    buffer = io.BytesIO()
+    pa_csv.write_csv(pa.Table.from_pandas(_df, preserve_index=False), buffer)
+    return buffer.getvalue()
+
+
+# === RESULTS PIPELINE ===
+def _breakdown(rows: list, key: str) -> pd.DataFrame:
+    """Breakdown table from (key, total, count, avg) rows, already largest total first."""
+    return pd.DataFrame(
+        rows, columns=[key, "Total Amount", "Count", "Avg Amount"]
+    ).set_index(key)
+
+
+def _load_results(db_session, server_filters: tuple, page_limit: int) -> dict:
+    """Fetch one page of matching invoices plus stats and breakdowns over every match."""
+    (
+        show_deleted, selected_vendor, selected_category, date_range,
+        selected_source, amount_range, search_text,
+    ) = server_filters
+
+    # Every filter is a SQL predicate; the same filters feed the
+    # delete/restore ID pools so their option lists stay bounded
+    filters = {
+        "vendor": None if selected_vendor == "All" else selected_vendor,
+        "category": None if selected_category == "All" else selected_category,
+        "source": None if selected_source == "All" else selected_source,
+        "date_from": date_range[0] if len(date_range) == 2 else None,
+        "date_to": date_range[1] if len(date_range) == 2 else None,
+        "min_amount": amount_range[0],
+        "max_amount": amount_range[1],
+        "search_text": search_text or None,
+    }
+
+    # Fetch one extra row to know whether another page exists
+    filtered = db.search_invoices(
+        db_session, **filters, limit=page_limit + 1, include_deleted=show_deleted
+    )
+    has_more = len(filtered) > page_limit
+    filtered = filtered.head(page_limit)
+
+    # Stats and breakdowns are aggregated in SQL over the whole filtered set;
+    # only the table rows are paginated
+    summary = db.get_search_summary(db_session, filters, include_deleted=show_deleted)
+
+    active_ids = db.get_active_ids(db_session, filters)
+    deleted_ids = db.get_deleted_ids(db_session, filters) if show_deleted else []
+
+    return {
+        "has_more": has_more,
+        "filtered": filtered,
+        "count": summary["count"],
+        "total": summary["total"],
+        "avg": summary["avg"],
+        "unique_vendors": summary["unique_vendors"],
+        "by_category": _breakdown(summary["by_category"], "Category"),
+        "by_source": _breakdown(summary["by_source"], "Source"),
+        "active_ids": active_ids,
+        "deleted_ids": deleted_ids,
+        "loaded_at": datetime.now(),
+    }
+
+
+def _load_more():
+    """Grow the result page by PAGE_SIZE rows ("Load more" callback)."""
+    st.session_state["details_page_limit"] += PAGE_SIZE
+
+
 st.set_page_config(
     page_title="Invoice Search",
     page_icon="mag",
@@ -31,7 +126,7 @@ if db is None:
     st.error("Database connection failed")
     st.stop()
 
-session = db.get_session()
+session = get_cached_session(db)
 
 # === AUTHENTICATION GATEKEEPER ===
 if not st.session_state.get("authenticated"):
@@ -77,339 +172,324 @@ if user_role == "admin":
             help="Toggle to view soft-deleted invoices"
         )
 
-# Get all invoices (including deleted if admin toggle is on)
-all_invoices = db.get_all_invoices(session, limit=10000, include_deleted=show_deleted)
+# Filter options come from the database so the page never pulls every invoice
+filter_options = _filter_options(session, show_deleted)
 
-if not all_invoices:
+if filter_options["total_count"] == 0:
     st.info("No invoices found. Upload some data first.")
-    session.close()
+    session.rollback()
     st.stop()
 
-# Create DataFrame with appropriate columns based on whether deleted records are included
-if show_deleted:
-    df_all = pd.DataFrame(
-        all_invoices,
-        columns=[
-            "ID", "Invoice #", "Vendor", "Date", "Amount",
-            "Category", "Source", "File", "Confidence", "Ingested", "Created By",
-            "Type", "Is Deleted", "Deleted At", "Deletion Reason"
-        ]
-    )
-else:
-    df_all = pd.DataFrame(
-        all_invoices,
-        columns=[
-            "ID", "Invoice #", "Vendor", "Date", "Amount",
-            "Category", "Source", "File", "Confidence", "Ingested", "Created By", "Type"
-        ]
-    )
-
-# === FILTERS ===
-st.subheader("Filter Invoices")
-
-col1, col2, col3, col4 = st.columns(4)
+# Filters, results and actions rerun as a fragment: changing a filter or
+# typing a search only re-executes this block, not the page chrome above
+@st.fragment
+def _render_search(filter_options: dict):
+    """Filter widgets, filtered results, breakdowns and delete/restore actions."""
+    # Fragment reruns skip get_cached_session, so clear any aborted transaction here
+    session.rollback()
+
+    # === FILTERS ===
+    st.subheader("Filter Invoices")
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        vendors = ["All"] + filter_options["vendors"]
+        selected_vendor = st.selectbox("Filter by Vendor", vendors)
+
+    with col2:
+        categories = ["All"] + filter_options["categories"]
+        selected_category = st.selectbox("Filter by Category", categories)
+
+    with col3:
+        sources = ["All"] + filter_options["sources"]
+        selected_source = st.selectbox("Filter by Source", sources)
+
+    with col4:
+        # Date range filter
+        min_date = filter_options["min_date"]
+        max_date = filter_options["max_date"]
+        date_range = st.date_input(
+            "Date Range",
+            value=(min_date, max_date),
+            min_value=min_date,
+            max_value=max_date,
+        )
 
-with col1:
-    vendors = ["All"] + sorted(df_all["Vendor"].unique().tolist())
-    selected_vendor = st.selectbox("Filter by Vendor", vendors)
+    # Additional filters
+    col5, col6 = st.columns(2)
 
-with col2:
-    categories = ["All"] + sorted([c for c in df_all["Category"].unique().tolist() if c])
-    selected_category = st.selectbox("Filter by Category", categories)
+    with col5:
+        amount_range = st.slider(
+            "Amount Range ($)",
+            min_value=filter_options["min_amount"],
+            max_value=filter_options["max_amount"],
+            value=(filter_options["min_amount"], filter_options["max_amount"]),
+            format="$%.2f"
+        )
 
-with col3:
-    sources = ["All"] + sorted(df_all["Source"].unique().tolist())
-    selected_source = st.selectbox("Filter by Source", sources)
+    with col6:
+        search_text = st.text_input("Search (Invoice # or Vendor)", placeholder="Type to search...")
 
-with col4:
-    # Date range filter
-    min_date = pd.to_datetime(df_all["Date"]).min().date()
-    max_date = pd.to_datetime(df_all["Date"]).max().date()
-    date_range = st.date_input(
-        "Date Range",
-        value=(min_date, max_date),
-        min_value=min_date,
-        max_value=max_date,
+    # All filters run in SQL; page size grows with "Load more" and resets
+    # whenever a filter changes
+    server_filters = (
+        show_deleted, selected_vendor, selected_category, tuple(date_range),
+        selected_source, tuple(amount_range), search_text,
     )
+    if st.session_state.get("details_server_filters") != server_filters:
+        st.session_state["details_server_filters"] = server_filters
+        st.session_state["details_page_limit"] = PAGE_SIZE
+    page_limit = st.session_state["details_page_limit"]
+
+    # Reuse the previous results when nothing that feeds them has changed
+    # (e.g. reruns from the delete/restore widgets); total_count picks up new
+    # uploads and the age check picks up other users' edits and deletes
+    results_key = (server_filters, page_limit, filter_options["total_count"])
+    results = st.session_state.get("_details_results")
+    if (
+        results is None
+        or results["key"] != results_key
+        or datetime.now() - results["loaded_at"] > RESULTS_MAX_AGE
+    ):
+        results = _load_results(session, server_filters, page_limit)
+        results["key"] = results_key
+        st.session_state["_details_results"] = results
 
-# Additional filters
-col5, col6 = st.columns(2)
+    has_more = results["has_more"]
+    filtered = results["filtered"]
+    result_count = results["count"]
+    result_total = results["total"]
+    result_avg = results["avg"]
 
-with col5:
-    amount_range = st.slider(
-        "Amount Range ($)",
-        min_value=float(df_all["Amount"].min()),
-        max_value=float(df_all["Amount"].max()),
-        value=(float(df_all["Amount"].min()), float(df_all["Amount"].max())),
-        format="$%.2f"
-    )
+    st.divider()
 
-with col6:
-    search_text = st.text_input("Search (Invoice # or Vendor)", placeholder="Type to search...")
+    # === RESULTS ===
+    st.subheader(f"Results: {result_count:,} invoices")
 
-# Apply filters
-filtered = df_all.copy()
+    if has_more:
+        st.caption(f"Showing the {page_limit:,} most recent of {result_count:,} matches.")
+        # on_click runs before the fragment reruns, so no explicit st.rerun() is needed
+        st.button(f"Load {PAGE_SIZE} more", key="details_load_more", on_click=_load_more)
 
-if selected_vendor != "All":
-    filtered = filtered[filtered["Vendor"] == selected_vendor]
+    # Summary metrics for filtered data
+    if result_count > 0:
+        col_sum1, col_sum2, col_sum3, col_sum4 = st.columns(4)
 
-if selected_category != "All":
-    filtered = filtered[filtered["Category"] == selected_category]
+        with col_sum1:
+            st.metric("Total", f"${result_total:,.2f}")
 
-if selected_source != "All":
-    filtered = filtered[filtered["Source"] == selected_source]
+        with col_sum2:
+            st.metric("Count", f"{result_count:,}")
 
-# Date filter
-if len(date_range) == 2:
-    filtered["Date"] = pd.to_datetime(filtered["Date"])
-    filtered = filtered[
-        (filtered["Date"].dt.date >= date_range[0]) &
-        (filtered["Date"].dt.date <= date_range[1])
-    ]
+        with col_sum3:
+            st.metric("Average", f"${result_avg:,.2f}")
 
-# Amount filter
-filtered = filtered[
-    (filtered["Amount"] >= amount_range[0]) &
-    (filtered["Amount"] <= amount_range[1])
-]
+        with col_sum4:
+            st.metric("Unique Vendors", f"{results['unique_vendors']:,}")
 
-# Text search
-if search_text:
-    search_lower = search_text.lower()
-    filtered = filtered[
-        filtered["Invoice #"].astype(str).str.lower().str.contains(search_lower, na=False) |
-        filtered["Vendor"].astype(str).str.lower().str.contains(search_lower, na=False)
-    ]
+        st.divider()
 
-st.divider()
+        # Sortable table (capped; the CSV export still contains every loaded row)
+        if len(filtered) > DISPLAY_ROW_LIMIT:
+            st.caption(
+                f"Showing the first {DISPLAY_ROW_LIMIT:,} of {len(filtered):,} loaded rows. "
+                "Export to CSV for all loaded rows."
+            )
+        st.dataframe(
+            filtered.head(DISPLAY_ROW_LIMIT),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Amount": st.column_config.NumberColumn(
+                    "Amount",
+                    format="$%.2f"
+                ),
+                "Confidence": st.column_config.NumberColumn(
+                    "Confidence",
+                    format="%.1f%%"
+                ),
+            }
+        )
 
-# === RESULTS ===
-st.subheader(f"Results: {len(filtered):,} invoices")
+        # Export button (CSV bytes are cached per filter state, not rebuilt every rerun)
+        # Stamped from the results load time so the name is stable across reruns
+        export_filename = f"filtered_invoices_{results['loaded_at']:%Y%m%d_%H%M%S}.csv"
+        if st.download_button(
+            label="Export Loaded Results to CSV",
+            data=_to_csv_bytes((results_key, results["loaded_at"]), filtered),
+            file_name=export_filename,
+            mime="text/csv"
+        ):
+            # Log the export action
+            AuditLog.log_action_async(
+                db.get_session,
+                user_id=user_id,
+                action="export_invoices",
+                entity_type="invoice",
+                details={
+                    "filename": export_filename,
+                    "record_count": len(filtered),
+                    "total_amount": float(filtered["Amount"].sum()),
+                    "filters": {
+                        "vendor": selected_vendor,
+                        "category": selected_category,
+                        "source": selected_source
+                    }
+                }
+            )
+    else:
+        st.warning("No invoices match your filters. Try adjusting the criteria.")
 
-# Summary metrics for filtered data
-if len(filtered) > 0:
-    col_sum1, col_sum2, col_sum3, col_sum4 = st.columns(4)
+    st.divider()
 
-    with col_sum1:
-        st.metric("Total", f"${filtered['Amount'].sum():,.2f}")
+    # === QUICK STATS BY FILTER ===
+    if result_count > 0:
+        # Currency formatting is applied by the grid instead of pre-rendering strings
+        st.subheader("Breakdown by Category")
 
-    with col_sum2:
-        st.metric("Count", f"{len(filtered):,}")
+        st.dataframe(
+            results["by_category"],
+            use_container_width=True,
+            column_config=BREAKDOWN_COLUMN_CONFIG,
+        )
 
-    with col_sum3:
-        st.metric("Average", f"${filtered['Amount'].mean():,.2f}")
+        st.subheader("Breakdown by Source")
 
-    with col_sum4:
-        st.metric("Unique Vendors", f"{filtered['Vendor'].nunique():,}")
+        st.dataframe(
+            results["by_source"],
+            use_container_width=True,
+            column_config=BREAKDOWN_COLUMN_CONFIG,
+        )
 
     st.divider()
 
-    # Sortable table
-    st.dataframe(
-        filtered,
-        use_container_width=True,
-        hide_index=True,
-        column_config={
-            "Amount": st.column_config.NumberColumn(
-                "Amount",
-                format="$%.2f"
-            ),
-            "Confidence": st.column_config.NumberColumn(
-                "Confidence",
-                format="%.1f%%"
-            ),
-        }
-    )
+    # === DELETE / RESTORE SECTION ===
+    st.subheader("Invoice Actions")
 
-    # Export button
-    export_filename = f"filtered_invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    if st.download_button(
-        label="Export Filtered Results to CSV",
-        data=filtered.to_csv(index=False),
-        file_name=export_filename,
-        mime="text/csv"
-    ):
-        # Log the export action
-        AuditLog.log_action(
-            session,
-            user_id=user_id,
-            action="export_invoices",
-            entity_type="invoice",
-            details={
-                "filename": export_filename,
-                "record_count": len(filtered),
-                "total_amount": float(filtered["Amount"].sum()),
-                "filters": {
-                    "vendor": selected_vendor,
-                    "category": selected_category,
-                    "source": selected_source
-                }
-            }
-        )
-else:
-    st.warning("No invoices match your filters. Try adjusting the criteria.")
-
-st.divider()
-
-# === QUICK STATS BY FILTER ===
-if len(filtered) > 0:
-    st.subheader("Breakdown by Category")
-
-    category_summary = filtered.groupby("Category").agg({
-        "Amount": ["sum", "count", "mean"]
-    }).round(2)
-    category_summary.columns = ["Total Amount", "Count", "Avg Amount"]
-    category_summary = category_summary.sort_values("Total Amount", ascending=False)
-
-    # Format display
-    category_display = category_summary.copy()
-    category_display["Total Amount"] = category_display["Total Amount"].apply(lambda x: f"${x:,.2f}")
-    category_display["Avg Amount"] = category_display["Avg Amount"].apply(lambda x: f"${x:,.2f}")
-
-    st.dataframe(category_display, use_container_width=True)
-
-    st.subheader("Breakdown by Source")
-
-    source_summary = filtered.groupby("Source").agg({
-        "Amount": ["sum", "count", "mean"]
-    }).round(2)
-    source_summary.columns = ["Total Amount", "Count", "Avg Amount"]
-    source_summary = source_summary.sort_values("Total Amount", ascending=False)
-
-    # Format display
-    source_display = source_summary.copy()
-    source_display["Total Amount"] = source_display["Total Amount"].apply(lambda x: f"${x:,.2f}")
-    source_display["Avg Amount"] = source_display["Avg Amount"].apply(lambda x: f"${x:,.2f}")
-
-    st.dataframe(source_display, use_container_width=True)
-
-st.divider()
-
-# === DELETE / RESTORE SECTION ===
-st.subheader("Invoice Actions")
-
-# Only show delete functionality if user has permission (admin or operator)
-if user_role in ["admin", "operator"]:
-    # Select invoice to delete
-    invoice_ids = filtered["ID"].tolist() if len(filtered) > 0 else []
-
-    if invoice_ids:
-        col_action1, col_action2 = st.columns(2)
-
-        with col_action1:
-            st.markdown("**Delete Invoice**")
-
-            # Show only non-deleted invoices for deletion
-            if show_deleted:
-                active_ids = filtered[filtered["Is Deleted"] == False]["ID"].tolist()
-            else:
-                active_ids = invoice_ids
-
-            if active_ids:
-                selected_delete_id = st.selectbox(
-                    "Select Invoice ID to Delete",
-                    options=active_ids,
-                    key="delete_invoice_select"
-                )
-
-                # Show invoice details
-                if selected_delete_id:
-                    selected_invoice = filtered[filtered["ID"] == selected_delete_id].iloc[0]
-                    st.caption(f"Vendor: {selected_invoice['Vendor']} | Amount: ${selected_invoice['Amount']:.2f}")
-
-                # Delete form with reason
-                with st.form("delete_form"):
-                    delete_reason = st.text_area(
-                        "Reason for Deletion (required)",
-                        placeholder="e.g., Duplicate entry, Data entry error, etc."
+    # Only show delete functionality if user has permission (admin or operator)
+    if user_role in ["admin", "operator"]:
+        # ID pools come from SQL with the same filters (bounded, newest first)
+        active_ids = results["active_ids"]
+        deleted_ids = results["deleted_ids"]
+
+        if active_ids or deleted_ids:
+            col_action1, col_action2 = st.columns(2)
+
+            with col_action1:
+                st.markdown("**Delete Invoice**")
+
+                if active_ids:
+                    selected_delete_id = st.selectbox(
+                        "Select Invoice ID to Delete",
+                        options=active_ids,
+                        key="delete_invoice_select"
                     )
 
-                    delete_submitted = st.form_submit_button("Delete Invoice", type="primary")
+                    # Show invoice details (single primary-key lookup)
+                    selected_invoice = db.get_invoice_by_id(session, selected_delete_id)
+                    if selected_invoice:
+                        st.caption(f"Vendor: {selected_invoice['vendor_name']} | Amount: ${selected_invoice['amount']:.2f}")
+
+                    # Delete form with reason
+                    with st.form("delete_form"):
+                        delete_reason = st.text_area(
+                            "Reason for Deletion (required)",
+                            placeholder="e.g., Duplicate entry, Data entry error, etc."
+                        )
+
+                        delete_submitted = st.form_submit_button("Delete Invoice", type="primary")
+
+                        if delete_submitted:
+                            if not delete_reason or len(delete_reason.strip()) < 5:
+                                st.error("Please provide a reason for deletion (at least 5 characters)")
+                            else:
+                                success = db.soft_delete_invoice(
+                                    session,
+                                    invoice_id=selected_delete_id,
+                                    reason=delete_reason.strip(),
+                                    deleted_by=user_email
+                                )
+
+                                if success:
+                                    # Log the deletion
+                                    AuditLog.log_action_async(
+                                        db.get_session,
+                                        user_id=user_id,
+                                        action="soft_delete",
+                                        entity_type="invoice",
+                                        entity_id=selected_delete_id,
+                                        details={
+                                            "reason": delete_reason.strip(),
+                                            "vendor": selected_invoice['vendor_name'],
+                                            "amount": float(selected_invoice['amount'])
+                                        }
+                                    )
+                                    st.success(f"Invoice ID {selected_delete_id} has been deleted.")
+                                    _filter_options.clear()
+                                    _to_csv_bytes.clear()
+                                    st.session_state.pop("_details_results", None)
+                                    st.rerun()
+                                else:
+                                    st.error("Failed to delete invoice. Please try again.")
+                else:
+                    st.info("No active invoices available to delete.")
+
+            # Admin-only: Restore functionality
+            if user_role == "admin" and show_deleted:
+                with col_action2:
+                    st.markdown("**Restore Deleted Invoice**")
+
+                    if deleted_ids:
+                        selected_restore_id = st.selectbox(
+                            "Select Invoice ID to Restore",
+                            options=deleted_ids,
+                            key="restore_invoice_select"
+                        )
+
+                        # Show invoice details (single primary-key lookup)
+                        selected_deleted = db.get_invoice_by_id(session, selected_restore_id)
+                        if selected_deleted:
+                            st.caption(f"Vendor: {selected_deleted['vendor_name']} | Amount: ${selected_deleted['amount']:.2f}")
+                            st.caption(f"Deleted: {selected_deleted['deleted_at']} | Reason: {selected_deleted['deletion_reason']}")
 
-                    if delete_submitted:
-                        if not delete_reason or len(delete_reason.strip()) < 5:
-                            st.error("Please provide a reason for deletion (at least 5 characters)")
-                        else:
-                            success = db.soft_delete_invoice(
+                        if st.button("Restore Invoice", key="restore_btn"):
+                            success = db.restore_invoice(
                                 session,
-                                invoice_id=selected_delete_id,
-                                reason=delete_reason.strip(),
-                                deleted_by=user_email
+                                invoice_id=selected_restore_id,
+                                restored_by=user_email
                             )
 
                             if success:
-                                # Log the deletion
-                                AuditLog.log_action(
-                                    session,
+                                # Log the restoration
+                                AuditLog.log_action_async(
+                                    db.get_session,
                                     user_id=user_id,
-                                    action="soft_delete",
+                                    action="restore",
                                     entity_type="invoice",
-                                    entity_id=selected_delete_id,
+                                    entity_id=selected_restore_id,
                                     details={
-                                        "reason": delete_reason.strip(),
-                                        "vendor": selected_invoice['Vendor'],
-                                        "amount": float(selected_invoice['Amount'])
+                                        "vendor": selected_deleted['vendor_name'],
+                                        "amount": float(selected_deleted['amount'])
                                     }
                                 )
-                                st.success(f"Invoice ID {selected_delete_id} has been deleted.")
+                                st.success(f"Invoice ID {selected_restore_id} has been restored.")
+                                _filter_options.clear()
+                                _to_csv_bytes.clear()
+                                st.session_state.pop("_details_results", None)
                                 st.rerun()
                             else:
-                                st.error("Failed to delete invoice. Please try again.")
-            else:
-                st.info("No active invoices available to delete.")
-
-        # Admin-only: Restore functionality
-        if user_role == "admin" and show_deleted:
-            with col_action2:
-                st.markdown("**Restore Deleted Invoice**")
-
-                # Show only deleted invoices for restoration
-                deleted_ids = filtered[filtered["Is Deleted"] == True]["ID"].tolist()
-
-                if deleted_ids:
-                    selected_restore_id = st.selectbox(
-                        "Select Invoice ID to Restore",
-                        options=deleted_ids,
-                        key="restore_invoice_select"
-                    )
+                                st.error("Failed to restore invoice. Please try again.")
+                    else:
+                        st.info("No deleted invoices to restore.")
+    else:
+        st.info("You don't have permission to delete invoices. Contact an administrator.")
 
-                    # Show invoice details
-                    if selected_restore_id:
-                        selected_deleted = filtered[filtered["ID"] == selected_restore_id].iloc[0]
-                        st.caption(f"Vendor: {selected_deleted['Vendor']} | Amount: ${selected_deleted['Amount']:.2f}")
-                        st.caption(f"Deleted: {selected_deleted['Deleted At']} | Reason: {selected_deleted['Deletion Reason']}")
-
-                    if st.button("Restore Invoice", key="restore_btn"):
-                        success = db.restore_invoice(
-                            session,
-                            invoice_id=selected_restore_id,
-                            restored_by=user_email
-                        )
+    st.divider()
+    st.caption(f"Last updated: {results['loaded_at']:%Y-%m-%d %H:%M:%S}")
 
-                        if success:
-                            # Log the restoration
-                            AuditLog.log_action(
-                                session,
-                                user_id=user_id,
-                                action="restore",
-                                entity_type="invoice",
-                                entity_id=selected_restore_id,
-                                details={
-                                    "vendor": selected_deleted['Vendor'],
-                                    "amount": float(selected_deleted['Amount'])
-                                }
-                            )
-                            st.success(f"Invoice ID {selected_restore_id} has been restored.")
-                            st.rerun()
-                        else:
-                            st.error("Failed to restore invoice. Please try again.")
-                else:
-                    st.info("No deleted invoices to restore.")
-else:
-    st.info("You don't have permission to delete invoices. Contact an administrator.")
+    # End the read transaction; fragment reruns skip the end of the script
+    session.rollback()
 
-# Cleanup
-session.close()
 
-st.divider()
-st.caption(f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+_render_search(filter_options)
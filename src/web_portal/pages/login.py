@@ -5,6 +5,8 @@ Single admin user authentication using Streamlit Secrets.
 No database user management - credentials stored in .streamlit/secrets.toml
 """
 
+import hmac
+
 import streamlit as st
 
 # Page configuration
@@ -32,11 +34,16 @@ def verify_admin_credentials(email: str, password: str) -> dict:
         dict with success status and user info
     """
     try:
-        admin_email = st.secrets["admin"]["email"]
-        admin_password = st.secrets["admin"]["password"]
-        admin_name = st.secrets["admin"].get("full_name", "Administrator")
+        # Read secrets on every attempt: the lookup is cheap, the password is never
+        # copied into session state, and rotated secrets take effect immediately
+        admin = st.secrets["admin"]
+        admin_email = admin["email"]
+        admin_name = admin.get("full_name", "Administrator")
+
+        # Constant-time compare so response timing does not leak the password
+        password_ok = hmac.compare_digest(password.encode(), admin["password"].encode())
 
-        if email.lower().strip() == admin_email.lower().strip() and password == admin_password:
+        if email.lower().strip() == admin_email.lower().strip() and password_ok:
             return {
                 "success": True,
                 "email": admin_email,
@@ -0,0 +1,52 @@
+"""
+Test audit logging - Phase 7
+
+Unit tests for the background AuditLog writer (no database required).
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from database import auth
+from database.auth import AuditLog
+
+
+class TestAuditLogAsync:
+    """Tests for AuditLog.log_action_async and the background writer."""
+
+    def test_queued_events_are_written(self):
+        """Test queued events are inserted and committed by the writer thread."""
+        session = MagicMock()
+
+        AuditLog.log_action_async(
+            lambda: session,
+            user_id=1,
+            action="export_invoices",
+            entity_type="invoice",
+            details={"record_count": 3},
+        )
+        auth._audit_queue.join()
+
+        statement, params = session.execute.call_args.args
+        assert statement is auth.AUDIT_INSERT
+        assert params[0]["action"] == "export_invoices"
+        assert params[0]["details"] == '{"record_count": 3}'
+        session.commit.assert_called()
+        session.close.assert_called()
+
+    def test_failed_batch_is_rolled_back(self):
+        """Test a failing INSERT rolls back and does not stop the writer."""
+        session = MagicMock()
+        session.execute.side_effect = Exception("db down")
+
+        AuditLog.log_action_async(lambda: session, user_id=1, action="restore")
+        auth._audit_queue.join()
+
+        session.rollback.assert_called()
+        session.close.assert_called()
+        assert auth._audit_worker.is_alive()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -7,9 +7,11 @@ Uses test database configuration from environment variables.
 
 import os
 from datetime import date
+from decimal import Decimal
 from unittest.mock import MagicMock, patch
 
 import pandas as pd
+import pyarrow as pa
 import pytest
 
 # Test configuration - override for testing
@@ -61,6 +63,172 @@ class TestDatabaseManagerUnit:
             assert manager.region == "us-west-2"
 
 
+class TestInvoiceFilterClause:
+    """Unit tests for the shared invoice search WHERE-clause builder."""
+
+    def test_no_filters_returns_active_only(self):
+        """Test default clause only excludes soft-deleted rows."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database.database import _invoice_filter_clause
+
+            where_clause, params = _invoice_filter_clause()
+            assert where_clause == "WHERE is_deleted = :is_deleted"
+            assert params == {"is_deleted": False}
+
+            assert _invoice_filter_clause(is_deleted=None) == ("", {})
+
+    def test_filters_are_bound_parameters(self):
+        """Test each filter adds a predicate with a bound parameter."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database.database import _invoice_filter_clause
+
+            where_clause, params = _invoice_filter_clause(
+                vendor="Acme Corp",
+                source="excel_bulk",
+                date_from=date(2024, 1, 1),
+                min_amount=10.0,
+                max_amount=99.5,
+            )
+            assert "vendor_name = :vendor" in where_clause
+            assert "source_type = :source" in where_clause
+            assert "invoice_date >= :date_from" in where_clause
+            assert params["vendor"] == "Acme Corp"
+            assert params["min_amount"] == 10.0
+            assert params["max_amount"] == 99.5
+            assert "Acme" not in where_clause
+
+    def test_search_text_escapes_like_wildcards(self):
+        """Test search text is lowercased and matched literally via LIKE."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database.database import _invoice_filter_clause
+
+            where_clause, params = _invoice_filter_clause(search_text="50%_OFF")
+            assert "lower(vendor_name) LIKE :search" in where_clause
+            assert params["search"] == "%50\\%\\_off%"
+
+
+class TestRowsToArrowFrame:
+    """Unit tests for the row-to-Arrow DataFrame conversion (no database required)."""
+
+    def test_columns_are_arrow_backed(self):
+        """Test Decimal amounts become float64 and text columns Arrow strings."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database.database import _rows_to_arrow_frame
+
+            rows = [
+                (1, "INV-1", "Acme", date(2024, 1, 15), Decimal("10.50"), "Rent"),
+                (2, "INV-2", None, date(2024, 1, 16), Decimal("20.25"), None),
+            ]
+            df = _rows_to_arrow_frame(
+                rows, ["ID", "Invoice #", "Vendor", "Date", "Amount", "Category"]
+            )
+
+            assert isinstance(df["Amount"].dtype, pd.ArrowDtype)
+            assert df["Amount"].dtype.pyarrow_dtype == pa.float64()
+            assert df["Vendor"].dtype.pyarrow_dtype == pa.string()
+            assert df["Amount"].tolist() == [10.5, 20.25]
+            assert df["Vendor"].isna().tolist() == [False, True]
+
+    def test_all_null_text_column_stays_string(self):
+        """Test an all-NULL text column is typed as string, not null."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database.database import _rows_to_arrow_frame
+
+            df = _rows_to_arrow_frame([(None, None), (None, None)], ["Category", "Confidence"])
+
+            assert df["Category"].dtype.pyarrow_dtype == pa.string()
+            assert df["Confidence"].dtype.pyarrow_dtype == pa.float64()
+
+    def test_no_rows_returns_empty_frame(self):
+        """Test an empty result keeps the requested columns."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database.database import _rows_to_arrow_frame
+
+            df = _rows_to_arrow_frame([], ["ID", "Vendor"])
+
+            assert df.empty
+            assert list(df.columns) == ["ID", "Vendor"]
+
+
+class TestSearchSummary:
+    """Unit tests for the search summary aggregate (no database required)."""
+
+    def test_grouping_sets_rows_are_split(self):
+        """Test the overall row and each breakdown row land in the right place."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database.database import DatabaseManager
+
+            manager = DatabaseManager(host="h", port=5432, user="u", password="p", database="d")
+            session = MagicMock()
+            session.execute.return_value.fetchall.return_value = [
+                (1, 1, None, None, 3, 600, 200, 2),
+                (0, 1, "Rent", None, 2, 500, 250, 1),
+                (1, 0, None, "excel_bulk", 3, 600, 200, 2),
+                (0, 1, None, None, 1, 100, 100, 1),
+            ]
+
+            summary = manager.get_search_summary(session, {"vendor": "Acme"}, include_deleted=True)
+
+            assert summary["count"] == 3
+            assert summary["total"] == 600.0
+            assert summary["avg"] == 200.0
+            assert summary["unique_vendors"] == 2
+            assert summary["by_category"] == [("Rent", 500.0, 2, 250.0)]
+            assert summary["by_source"] == [("excel_bulk", 600.0, 3, 200.0)]
+            statement, params = session.execute.call_args.args
+            assert "GROUPING SETS" in str(statement)
+            assert params == {"vendor": "Acme"}
+
+    def test_query_error_returns_empty_summary(self):
+        """Test a failing query yields zeroed stats instead of raising."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database.database import DatabaseManager
+
+            manager = DatabaseManager(host="h", port=5432, user="u", password="p", database="d")
+            session = MagicMock()
+            session.execute.side_effect = Exception("db down")
+
+            summary = manager.get_search_summary(session, {})
+            assert summary["count"] == 0
+            assert summary["by_category"] == []
+
+
+class TestCopyStream:
+    """Unit tests for the streaming COPY path (no database required)."""
+
+    def test_read_returns_requested_chunk_sizes(self):
+        """Test lines are pulled lazily and re-chunked to the requested size."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database.database import _CopyStream
+
+            stream = _CopyStream(iter(["a,b\n", "cc,dd\n", "e,f\n"]))
+            assert stream.read(4) == "a,b\n"
+            assert stream.read(4) == "cc,d"
+            assert stream.read() == "d\ne,f\n"
+            assert stream.read(8) == ""
+
+    def test_save_bulk_invoices_iter_streams_generator(self):
+        """Test a generator is COPYed as CSV and the row count returned."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database.database import DatabaseManager
+
+            manager = DatabaseManager(host="h", port=5432, user="u", password="p", database="d")
+            session = MagicMock()
+            cursor = session.connection.return_value.connection.cursor.return_value
+            copied = []
+            cursor.copy_expert.side_effect = lambda sql, stream: copied.append(stream.read(16) + stream.read())
+
+            rows = ((date(2024, 1, i + 1), f"Vendor, {i}", 10.0 * i, "Rent") for i in range(3))
+            inserted = manager.save_bulk_invoices_iter(session, rows, "test_iter")
+
+            assert inserted == 3
+            lines = copied[0].splitlines()
+            assert len(lines) == 3
+            assert lines[0].startswith("AUTO-")
+            assert ',"Vendor, 0",2024-01-01,0.0,Rent,test_iter,bulk_upload,' in lines[0]
+            session.connection.return_value.connection.commit.assert_called_once()
+
+
 class TestDatabaseManagerIntegration:
     """
     Integration tests that require a real database.
@@ -165,6 +333,26 @@ class TestDatabaseManagerIntegration:
         session.close()
 
 
+class TestGetCachedSession:
+    """Unit tests for the per-browser-session Session cache."""
+
+    def test_reused_session_is_rolled_back(self):
+        """Test a cached Session is rolled back before reuse so an aborted transaction clears."""
+        with patch("streamlit.cache_resource", lambda f: f):
+            from database import database
+
+            db = MagicMock()
+            with patch.object(database.st, "session_state", {}):
+                first = database.get_cached_session(db)
+                first.rollback.assert_not_called()
+
+                second = database.get_cached_session(db)
+
+            assert second is first
+            db.get_session.assert_called_once()
+            first.rollback.assert_called_once()
+
+
 class TestGetDbManager:
     """Test the get_db_manager singleton function."""
 
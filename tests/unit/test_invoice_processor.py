@@ -12,68 +12,137 @@ Tests cover:
 
 import json
 import os
-import sys
+from functools import lru_cache
 from unittest.mock import patch, MagicMock
 
 import pytest
 
-# Add src to path for imports
-sys.path.insert(
-    0, os.path.join(os.path.dirname(__file__), "..", "..", "src", "lambda_functions")
-)
+try:
+    from orjson import loads as _loads
+except ImportError:  # orjson is a dev-only speedup
+    _loads = json.loads
 
-from invoice_processor import _process_record, _response, lambda_handler
+import invoice_processor
+from invoice_processor import _get_s3_object_metadata, _process_record, _response, lambda_handler
+
+
+TEST_ENV = {
+    "INVOICE_BUCKET": "test-bucket",
+    "ALLOWED_FORMATS": "pdf,jpg,jpeg,png",
+}
+
+
+@pytest.fixture(scope="session", autouse=True)
+def lambda_env():
+    """Set the Lambda environment once for the whole session and restore it afterwards."""
+    saved = {name: os.environ.get(name) for name in TEST_ENV}
+    os.environ.update(TEST_ENV)
+    yield
+    for name, value in saved.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+@pytest.fixture(scope="session", autouse=True)
+def textract_disabled():
+    """Disable Textract for unit tests via the module-level flag (read once at import)."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(invoice_processor, "_TEXTRACT_ENABLED", False)
+        yield
+
+
+@pytest.fixture(scope="module")
+def aws_mock():
+    """Start moto once for this module and create the test bucket."""
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    with moto.mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=TEST_ENV["INVOICE_BUCKET"])
+        yield s3
+
+
+# Shared S3 record template; create_s3_event copies it and fills in the per-test fields
+_S3_RECORD_TEMPLATE = {
+    "eventName": "ObjectCreated:Put",
+    "eventTime": "2026-01-12T02:00:00Z",
+    "s3": {"bucket": {"name": ""}, "object": {"key": "", "size": 0}},
+}
 
 
 def create_s3_event(
     bucket: str, key: str, size: int = 1024, event_name: str = "ObjectCreated:Put"
 ) -> dict:
     """Helper: create fake S3 event."""
+    record = {
+        **_S3_RECORD_TEMPLATE,
+        "eventName": event_name,
+        "s3": {"bucket": {"name": bucket}, "object": {"key": key, "size": size}},
+    }
+    return {"Records": [record]}
+
+
+def _make_event(*specs: tuple, bucket: str = "test-bucket") -> dict:
+    """Helper: create fake S3 event with one record per (key, size) spec."""
     return {
-        "Records": [
-            {
-                "eventName": event_name,
-                "eventTime": "2026-01-12T02:00:00Z",
-                "s3": {
-                    "bucket": {"name": bucket},
-                    "object": {"key": key, "size": size},
-                },
-            }
-        ]
+        "Records": [create_s3_event(bucket, key, size)["Records"][0] for key, size in specs]
     }
 
 
-class TestValidEvents:
-    """Test successful event processing."""
+@lru_cache(maxsize=64)
+def _event_cached(bucket: str, key: str, size: int = 1024) -> str:
+    """Helper: build an S3 event once per (bucket, key, size) and keep it as frozen JSON."""
+    return json.dumps(create_s3_event(bucket, key, size))
 
-    def setup_method(self) -> None:
-        """Set up test environment variables."""
-        os.environ["INVOICE_BUCKET"] = "test-bucket"
-        os.environ["ALLOWED_FORMATS"] = "pdf,jpg,jpeg,png"
-        os.environ["TEXTRACT_ENABLED"] = "false"  # Disable for unit tests
 
-    def test_valid_pdf_event(self) -> None:
-        """Should accept valid PDF."""
-        event = create_s3_event("test-bucket", "invoices/test.pdf")
+@pytest.fixture
+def event(request) -> dict:
+    """Fresh copy of the cached S3 event for the parametrized object key."""
+    return _loads(_event_cached("test-bucket", request.param))
 
-        response = lambda_handler(event, None)
 
-        assert response["statusCode"] == 200
-        body = json.loads(response["body"])
-        assert body["results"][0]["success"] is True
-        assert body["results"][0]["key"] == "invoices/test.pdf"
-        assert body["results"][0]["format"] == "pdf"
+def _body(response: dict) -> dict:
+    """Helper: decode a Lambda response body."""
+    return _loads(response["body"])
+
 
-    def test_valid_jpg_event(self) -> None:
-        """Should accept valid JPG."""
-        event = create_s3_event("test-bucket", "invoices/receipt.jpg")
+class TestFileFormats:
+    """Test allowed and rejected file formats."""
+
+    @pytest.mark.parametrize(
+        "event,expected_ok,expected_format",
+        [
+            ("invoices/test.pdf", True, "pdf"),
+            ("invoices/receipt.jpg", True, "jpg"),
+            ("invoices/image.png", True, "png"),  # Phase 3 update
+            ("invoices/document.txt", False, None),
+            ("invoices/image.gif", False, None),
+            ("invoices/noextension", False, None),
+        ],
+        indirect=["event"],
+        ids=["pdf", "jpg", "png", "txt", "gif", "noextension"],
+    )
+    def test_format_matrix(self, event: dict, expected_ok: bool, expected_format) -> None:
+        """Should accept PDF/JPG/PNG and reject everything else."""
+        key = event["Records"][0]["s3"]["object"]["key"]
 
         response = lambda_handler(event, None)
 
-        assert response["statusCode"] == 200
-        body = json.loads(response["body"])
-        assert body["results"][0]["success"] is True
-        assert body["results"][0]["format"] == "jpg"
+        assert response["statusCode"] == 200  # Overall request succeeds
+        result = _body(response)["results"][0]
+        assert result["success"] is expected_ok
+        if expected_ok:
+            assert result["key"] == key
+            assert result["format"] == expected_format
+        else:
+            assert "Invalid file format" in result["error"]
+
+
+class TestValidEvents:
+    """Test successful event processing."""
 
     def test_url_encoded_key(self) -> None:
         """Should handle URL-encoded file names."""
@@ -82,7 +151,7 @@ class TestValidEvents:
         response = lambda_handler(event, None)
 
         assert response["statusCode"] == 200
-        body = json.loads(response["body"])
+        body = _body(response)
         assert body["results"][0]["key"] == "invoices/my invoice file.pdf"
 
     def test_returns_idempotency_key(self) -> None:
@@ -91,7 +160,7 @@ class TestValidEvents:
 
         response = lambda_handler(event, None)
 
-        body = json.loads(response["body"])
+        body = _body(response)
         assert "idempotencyKey" in body["results"][0]
         assert "test.pdf:2048:" in body["results"][0]["idempotencyKey"]
 
@@ -99,42 +168,6 @@ class TestValidEvents:
 class TestInvalidFiles:
     """Test file validation."""
 
-    def setup_method(self) -> None:
-        """Set up test environment variables."""
-        os.environ["INVOICE_BUCKET"] = "test-bucket"
-        os.environ["ALLOWED_FORMATS"] = "pdf,jpg,jpeg,png"
-        os.environ["TEXTRACT_ENABLED"] = "false"  # Disable for unit tests
-
-    def test_invalid_format_txt(self) -> None:
-        """Should reject .txt files."""
-        event = create_s3_event("test-bucket", "invoices/document.txt")
-
-        response = lambda_handler(event, None)
-
-        assert response["statusCode"] == 200  # Overall request succeeds
-        body = json.loads(response["body"])
-        assert body["results"][0]["success"] is False
-        assert "Invalid file format" in body["results"][0]["error"]
-
-    def test_valid_format_png(self) -> None:
-        """Should accept .png files (Phase 3 update)."""
-        event = create_s3_event("test-bucket", "invoices/image.png")
-
-        response = lambda_handler(event, None)
-
-        body = json.loads(response["body"])
-        assert body["results"][0]["success"] is True
-        assert body["results"][0]["format"] == "png"
-
-    def test_invalid_format_gif(self) -> None:
-        """Should reject .gif files."""
-        event = create_s3_event("test-bucket", "invoices/image.gif")
-
-        response = lambda_handler(event, None)
-
-        body = json.loads(response["body"])
-        assert body["results"][0]["success"] is False
-
     def test_file_too_large(self) -> None:
         """Should reject files > 500MB."""
         large_size = 600 * 1024 * 1024  # 600 MB
@@ -142,7 +175,7 @@ class TestInvalidFiles:
 
         response = lambda_handler(event, None)
 
-        body = json.loads(response["body"])
+        body = _body(response)
         assert body["results"][0]["success"] is False
         assert "too large" in body["results"][0]["error"].lower()
 
@@ -153,17 +186,17 @@ class TestInvalidFiles:
 
         response = lambda_handler(event, None)
 
-        body = json.loads(response["body"])
+        body = _body(response)
         assert body["results"][0]["success"] is True
 
-    def test_wrong_bucket(self) -> None:
+    def test_wrong_bucket(self, monkeypatch) -> None:
         """Should reject events from wrong bucket."""
-        os.environ["INVOICE_BUCKET"] = "correct-bucket"
+        monkeypatch.setenv("INVOICE_BUCKET", "correct-bucket")
         event = create_s3_event("wrong-bucket", "invoices/test.pdf")
 
         response = lambda_handler(event, None)
 
-        body = json.loads(response["body"])
+        body = _body(response)
         assert body["results"][0]["success"] is False
         assert "Unexpected bucket" in body["results"][0]["error"]
 
@@ -171,12 +204,6 @@ class TestInvalidFiles:
 class TestErrorHandling:
     """Test error cases."""
 
-    def setup_method(self) -> None:
-        """Set up test environment variables."""
-        os.environ["INVOICE_BUCKET"] = "test-bucket"
-        os.environ["ALLOWED_FORMATS"] = "pdf,jpg,jpeg,png"
-        os.environ["TEXTRACT_ENABLED"] = "false"
-
     def test_empty_records(self) -> None:
         """Should handle empty Records array."""
         event = {"Records": []}
@@ -184,7 +211,7 @@ class TestErrorHandling:
         response = lambda_handler(event, None)
 
         assert response["statusCode"] == 400
-        body = json.loads(response["body"])
+        body = _body(response)
         assert "No records found" in body["error"]
 
     def test_missing_records_key(self) -> None:
@@ -194,7 +221,7 @@ class TestErrorHandling:
         response = lambda_handler(event, None)
 
         assert response["statusCode"] == 400
-        body = json.loads(response["body"])
+        body = _body(response)
         assert "No records found" in body["error"]
 
     def test_malformed_s3_data(self) -> None:
@@ -205,86 +232,32 @@ class TestErrorHandling:
 
         # Should not crash, but record should fail
         assert response["statusCode"] == 200
-        body = json.loads(response["body"])
+        body = _body(response)
         assert body["results"][0]["success"] is False
 
-    def test_no_extension_in_key(self) -> None:
-        """Should handle files without extension."""
-        event = create_s3_event("test-bucket", "invoices/noextension")
-
-        response = lambda_handler(event, None)
-
-        body = json.loads(response["body"])
-        assert body["results"][0]["success"] is False
-        assert "Invalid file format" in body["results"][0]["error"]
-
 
 class TestMultipleRecords:
     """Test handling of multiple records in single event."""
 
-    def setup_method(self) -> None:
-        """Set up test environment variables."""
-        os.environ["INVOICE_BUCKET"] = "test-bucket"
-        os.environ["ALLOWED_FORMATS"] = "pdf,jpg,jpeg,png"
-        os.environ["TEXTRACT_ENABLED"] = "false"
-
     def test_multiple_valid_records(self) -> None:
         """Should process multiple records."""
-        event = {
-            "Records": [
-                {
-                    "eventName": "ObjectCreated:Put",
-                    "eventTime": "2026-01-12T02:00:00Z",
-                    "s3": {
-                        "bucket": {"name": "test-bucket"},
-                        "object": {"key": "invoices/file1.pdf", "size": 1024},
-                    },
-                },
-                {
-                    "eventName": "ObjectCreated:Put",
-                    "eventTime": "2026-01-12T02:01:00Z",
-                    "s3": {
-                        "bucket": {"name": "test-bucket"},
-                        "object": {"key": "invoices/file2.jpg", "size": 2048},
-                    },
-                },
-            ]
-        }
+        event = _make_event(("invoices/file1.pdf", 1024), ("invoices/file2.jpg", 2048))
 
         response = lambda_handler(event, None)
 
         assert response["statusCode"] == 200
-        body = json.loads(response["body"])
+        body = _body(response)
         assert len(body["results"]) == 2
         assert body["results"][0]["success"] is True
         assert body["results"][1]["success"] is True
 
     def test_mixed_valid_invalid_records(self) -> None:
         """Should process mix of valid and invalid records."""
-        event = {
-            "Records": [
-                {
-                    "eventName": "ObjectCreated:Put",
-                    "eventTime": "2026-01-12T02:00:00Z",
-                    "s3": {
-                        "bucket": {"name": "test-bucket"},
-                        "object": {"key": "invoices/valid.pdf", "size": 1024},
-                    },
-                },
-                {
-                    "eventName": "ObjectCreated:Put",
-                    "eventTime": "2026-01-12T02:01:00Z",
-                    "s3": {
-                        "bucket": {"name": "test-bucket"},
-                        "object": {"key": "invoices/invalid.txt", "size": 512},
-                    },
-                },
-            ]
-        }
+        event = _make_event(("invoices/valid.pdf", 1024), ("invoices/invalid.txt", 512))
 
         response = lambda_handler(event, None)
 
-        body = json.loads(response["body"])
+        body = _body(response)
         assert body["results"][0]["success"] is True
         assert body["results"][1]["success"] is False
 
@@ -298,7 +271,7 @@ class TestResponseFormat:
 
         assert resp["statusCode"] == 200
         assert resp["headers"]["Content-Type"] == "application/json"
-        body = json.loads(resp["body"])
+        body = _body(resp)
         assert body["key"] == "test.pdf"
 
     def test_response_400(self) -> None:
@@ -306,7 +279,7 @@ class TestResponseFormat:
         resp = _response(400, {"error": "Invalid"})
 
         assert resp["statusCode"] == 400
-        body = json.loads(resp["body"])
+        body = _body(resp)
         assert body["error"] == "Invalid"
 
     def test_response_500(self) -> None:
@@ -319,12 +292,6 @@ class TestResponseFormat:
 class TestProcessRecord:
     """Test _process_record helper function."""
 
-    def setup_method(self) -> None:
-        """Set up test environment variables."""
-        os.environ["INVOICE_BUCKET"] = "test-bucket"
-        os.environ["ALLOWED_FORMATS"] = "pdf,jpg,jpeg,png"
-        os.environ["TEXTRACT_ENABLED"] = "false"
-
     def test_process_valid_record(self) -> None:
         """Should process valid record."""
         record = {
@@ -346,5 +313,33 @@ class TestProcessRecord:
         assert result["status"] == "queued_for_textract"
 
 
+class TestS3Metadata:
+    """Test S3 object metadata lookup (moto-backed)."""
+
+    @pytest.fixture(autouse=True)
+    def _reset(self, aws_mock, monkeypatch):
+        """Point the Lambda at the mocked client and empty the bucket afterwards."""
+        monkeypatch.setattr(invoice_processor, "_s3_client", aws_mock)
+        yield
+        bucket = TEST_ENV["INVOICE_BUCKET"]
+        for obj in aws_mock.list_objects_v2(Bucket=bucket).get("Contents", []):
+            aws_mock.delete_object(Bucket=bucket, Key=obj["Key"])
+
+    def test_reads_transaction_type(self, aws_mock) -> None:
+        """Should return user metadata set at upload time."""
+        aws_mock.put_object(
+            Bucket="test-bucket", Key="invoices/test.pdf", Body=b"%PDF",
+            Metadata={"transaction-type": "income"},
+        )
+
+        metadata = _get_s3_object_metadata("test-bucket", "invoices/test.pdf")
+
+        assert metadata == {"transaction-type": "income"}
+
+    def test_missing_object_returns_empty(self) -> None:
+        """Should return {} when the object does not exist."""
+        assert _get_s3_object_metadata("test-bucket", "invoices/missing.pdf") == {}
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
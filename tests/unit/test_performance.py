@@ -1,22 +1,22 @@
 """
 Performance tests for database operations - Phase 5
 
-Measures rows per second for different insert methods:
+Benchmarks different insert methods with pytest-benchmark (INSERT and COPY
+are grouped by dataset size so the report compares them side by side):
 - Traditional INSERT (slow, ~20 rows/sec)
 - PostgreSQL COPY (fast, ~10,000 rows/sec)
 - Hybrid method (auto-selects best approach)
 """
 
+import importlib.util
 import os
-import time
 from datetime import date, timedelta
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import pytest
-
-# Add project root to path
-import sys
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from sqlalchemy import text
 
 from database.database import DatabaseManager
 
@@ -27,10 +27,26 @@ TEST_USER = os.getenv("TEST_DB_USER", "postgres")
 TEST_PASSWORD = os.getenv("TEST_DB_PASSWORD", "password")
 TEST_DATABASE = os.getenv("TEST_DB_NAME", "test_invoices")
 
+requires_benchmark = pytest.mark.skipif(
+    importlib.util.find_spec("pytest_benchmark") is None,
+    reason="pytest-benchmark not installed",
+)
 
-@pytest.fixture
+# Session-scoped Postgres connection can't be shared across xdist workers
+pytestmark = pytest.mark.serial
+
+# source_type tags written by the benchmarks below
+TEST_SOURCES = [
+    "test_insert_small", "test_insert_large",
+    "test_copy_small", "test_copy_large", "test_copy_iter_large",
+    "test_mixed_small", "test_mixed_large",
+    "test_threshold_99", "test_threshold_100",
+]
+
+
+@pytest.fixture(scope="session")
 def db_manager():
-    """Create database manager for testing."""
+    """Create one database manager (engine + pool) shared by all tests."""
     manager = DatabaseManager(
         host=TEST_HOST,
         port=TEST_PORT,
@@ -42,145 +58,175 @@ def db_manager():
     manager.close()
 
 
+@pytest.fixture(autouse=True)
+def _truncate(db_manager):
+    """Remove rows left by earlier benchmarks so timings start from the same state."""
+    session = db_manager.get_session()
+    try:
+        session.execute(
+            text("DELETE FROM invoices WHERE source_type = ANY(:sources)"),
+            {"sources": TEST_SOURCES},
+        )
+        session.commit()
+    finally:
+        session.close()
+    yield
+
+
 @pytest.fixture
+def session(db_manager):
+    """Yield a session that is always rolled back and returned to the pool."""
+    s = db_manager.get_session()
+    try:
+        yield s
+    finally:
+        s.rollback()
+        s.close()
+
+
+def _sample_invoices(n_rows: int, n_vendors: int) -> pd.DataFrame:
+    """Build n_rows of synthetic invoices column-wise as an Arrow-backed DataFrame."""
+    i = np.arange(n_rows)
+    table = pa.table({
+        "Date": pa.array(np.datetime64(date.today(), "D") - (i % 30), type=pa.date32()),
+        "Vendor": np.char.add("Vendor ", (i % n_vendors).astype(str)),
+        "Amount": (i % 10) * 100 + 50.00,
+        "Category": np.take(np.array(["Inventory", "Utilities", "Rent", "Other"]), i % 4),
+    })
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+@pytest.fixture(scope="session")
 def sample_data_small():
     """Create small sample invoice data (50 rows)."""
-    rows = []
-    for i in range(50):
-        rows.append({
-            "Date": date.today() - timedelta(days=i % 30),
-            "Vendor": f"Vendor {i % 10}",
-            "Amount": (i % 10) * 100 + 50.00,
-            "Category": ["Inventory", "Utilities", "Rent", "Other"][i % 4],
-        })
-    return pd.DataFrame(rows)
+    return _sample_invoices(50, 10)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_data_large():
     """Create large sample invoice data (1000 rows)."""
-    rows = []
-    for i in range(1000):
-        rows.append({
-            "Date": date.today() - timedelta(days=i % 30),
-            "Vendor": f"Vendor {i % 50}",
-            "Amount": (i % 10) * 100 + 50.00,
-            "Category": ["Inventory", "Utilities", "Rent", "Other"][i % 4],
-        })
-    return pd.DataFrame(rows)
+    return _sample_invoices(1000, 50)
+
+
+def _benchmark_save(benchmark, db_manager, save, data, source_type):
+    """
+    Run one bulk-save method under pytest-benchmark, clearing its rows before each round.
+
+    ``data`` is a DataFrame or a zero-argument factory (for single-use generators).
+    """
+    sessions = []
+
+    def setup():
+        session = db_manager.get_session()
+        session.execute(
+            text("DELETE FROM invoices WHERE source_type = :source"),
+            {"source": source_type},
+        )
+        session.commit()
+        sessions.append(session)
+        return (session, data() if callable(data) else data, source_type), {}
+
+    try:
+        return benchmark.pedantic(save, setup=setup, warmup_rounds=1, rounds=5)
+    finally:
+        for session in sessions:
+            session.rollback()
+            session.close()
 
 
 class TestInsertPerformance:
     """Performance benchmarks for INSERT method."""
 
     @pytest.mark.slow
-    def test_insert_small_dataset(self, db_manager, sample_data_small):
+    @requires_benchmark
+    def test_insert_small_dataset(self, benchmark, db_manager, sample_data_small):
         """Benchmark: Traditional INSERT with small dataset (50 rows)."""
-        session = db_manager.get_session()
-
-        start = time.time()
-        inserted = db_manager.save_bulk_invoices(
-            session, sample_data_small, "test_insert_small"
+        benchmark.group = "bulk save (50 rows)"
+        inserted = _benchmark_save(
+            benchmark, db_manager, db_manager.save_bulk_invoices,
+            sample_data_small, "test_insert_small",
         )
-        elapsed = time.time() - start
-
-        rows_per_sec = len(sample_data_small) / elapsed if elapsed > 0 else 0
-
-        print(f"\nINSERT Method (small): {inserted} rows in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
         assert inserted == len(sample_data_small)
 
-        session.close()
-
     @pytest.mark.slow
-    def test_insert_large_dataset(self, db_manager, sample_data_large):
+    @requires_benchmark
+    def test_insert_large_dataset(self, benchmark, db_manager, sample_data_large):
         """Benchmark: Traditional INSERT with large dataset (1000 rows)."""
-        session = db_manager.get_session()
-
-        start = time.time()
-        inserted = db_manager.save_bulk_invoices(
-            session, sample_data_large, "test_insert_large"
+        benchmark.group = "bulk save (1000 rows)"
+        inserted = _benchmark_save(
+            benchmark, db_manager, db_manager.save_bulk_invoices,
+            sample_data_large, "test_insert_large",
         )
-        elapsed = time.time() - start
-
-        rows_per_sec = len(sample_data_large) / elapsed if elapsed > 0 else 0
-
-        print(f"\nINSERT Method (large): {inserted} rows in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
         assert inserted == len(sample_data_large)
 
-        session.close()
-
 
 class TestCopyPerformance:
     """Performance benchmarks for COPY method."""
 
     @pytest.mark.slow
-    def test_copy_small_dataset(self, db_manager, sample_data_small):
+    @requires_benchmark
+    def test_copy_small_dataset(self, benchmark, db_manager, sample_data_small):
         """Benchmark: COPY command with small dataset (50 rows)."""
-        session = db_manager.get_session()
-
-        start = time.time()
-        inserted = db_manager.save_bulk_invoices_optimized(
-            session, sample_data_small, "test_copy_small"
+        benchmark.group = "bulk save (50 rows)"
+        inserted = _benchmark_save(
+            benchmark, db_manager, db_manager.save_bulk_invoices_optimized,
+            sample_data_small, "test_copy_small",
         )
-        elapsed = time.time() - start
-
-        rows_per_sec = len(sample_data_small) / elapsed if elapsed > 0 else 0
-
-        print(f"\nCOPY Method (small): {inserted} rows in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
         assert inserted == len(sample_data_small)
 
-        session.close()
-
     @pytest.mark.slow
-    def test_copy_large_dataset(self, db_manager, sample_data_large):
+    @requires_benchmark
+    def test_copy_large_dataset(self, benchmark, db_manager, sample_data_large):
         """Benchmark: COPY command with large dataset (1000 rows)."""
-        session = db_manager.get_session()
-
-        start = time.time()
-        inserted = db_manager.save_bulk_invoices_optimized(
-            session, sample_data_large, "test_copy_large"
+        benchmark.group = "bulk save (1000 rows)"
+        inserted = _benchmark_save(
+            benchmark, db_manager, db_manager.save_bulk_invoices_optimized,
+            sample_data_large, "test_copy_large",
         )
-        elapsed = time.time() - start
-
-        rows_per_sec = len(sample_data_large) / elapsed if elapsed > 0 else 0
-
-        print(f"\nCOPY Method (large): {inserted} rows in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
         assert inserted == len(sample_data_large)
 
-        session.close()
+    @pytest.mark.slow
+    @requires_benchmark
+    def test_copy_iter_large(self, benchmark, db_manager):
+        """Benchmark: streaming COPY from a generator (100,000 rows, no DataFrame)."""
+        benchmark.group = "bulk save (100000 rows)"
+        categories = ["Inventory", "Utilities", "Rent", "Other"]
+
+        def rows():
+            return (
+                (date.today() - timedelta(days=i % 30), f"Vendor {i % 50}",
+                 (i % 10) * 100 + 50.0, categories[i % 4])
+                for i in range(100_000)
+            )
+
+        inserted = _benchmark_save(
+            benchmark, db_manager, db_manager.save_bulk_invoices_iter,
+            rows, "test_copy_iter_large",
+        )
+        assert inserted == 100_000
 
 
 class TestMixedStrategy:
     """Tests for hybrid INSERT/COPY strategy."""
 
-    def test_mixed_selects_insert_for_small(self, db_manager, sample_data_small):
+    def test_mixed_selects_insert_for_small(self, db_manager, session, sample_data_small):
         """Test that mixed strategy uses INSERT for small datasets (<100 rows)."""
-        session = db_manager.get_session()
-
         # Small dataset should use INSERT
         inserted = db_manager.save_bulk_invoices_mixed(
             session, sample_data_small, "test_mixed_small"
         )
         assert inserted == len(sample_data_small)
 
-        session.close()
-
-    def test_mixed_selects_copy_for_large(self, db_manager, sample_data_large):
+    def test_mixed_selects_copy_for_large(self, db_manager, session, sample_data_large):
         """Test that mixed strategy uses COPY for large datasets (>=100 rows)."""
-        session = db_manager.get_session()
-
         # Large dataset should use COPY
         inserted = db_manager.save_bulk_invoices_mixed(
             session, sample_data_large, "test_mixed_large"
         )
         assert inserted == len(sample_data_large)
 
-        session.close()
-
-    def test_threshold_boundary(self, db_manager):
+    def test_threshold_boundary(self, db_manager, session):
         """Test behavior at the 100-row threshold."""
-        session = db_manager.get_session()
-
         # Create dataset with exactly 99 rows (should use INSERT)
         data_99 = pd.DataFrame([{
             "Date": date.today(),
@@ -207,39 +253,6 @@ class TestMixedStrategy:
         )
         assert inserted_100 == 100
 
-        session.close()
-
-
-class TestPerformanceComparison:
-    """Compare performance between INSERT and COPY methods."""
-
-    @pytest.mark.slow
-    def test_copy_faster_than_insert(self, db_manager, sample_data_large):
-        """Verify COPY is significantly faster than INSERT for large datasets."""
-        session = db_manager.get_session()
-
-        # Benchmark INSERT
-        start_insert = time.time()
-        db_manager.save_bulk_invoices(session, sample_data_large, "perf_insert")
-        insert_time = time.time() - start_insert
-
-        # Benchmark COPY
-        start_copy = time.time()
-        db_manager.save_bulk_invoices_optimized(session, sample_data_large, "perf_copy")
-        copy_time = time.time() - start_copy
-
-        speedup = insert_time / copy_time if copy_time > 0 else float("inf")
-
-        print(f"\nPerformance Comparison (1000 rows):")
-        print(f"  INSERT: {insert_time:.2f}s")
-        print(f"  COPY:   {copy_time:.2f}s")
-        print(f"  Speedup: {speedup:.1f}x faster")
-
-        # COPY should be at least 10x faster for 1000 rows
-        assert speedup > 10, f"Expected >10x speedup, got {speedup:.1f}x"
-
-        session.close()
-
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-s", "-m", "not slow"])
@@ -10,23 +10,19 @@ Tests cover:
 """
 
 import json
-import os
-import sys
 from datetime import datetime
 from unittest.mock import MagicMock, patch
 
+import pandas as pd
 import pytest
 
-# Add src to path for imports
-sys.path.insert(
-    0, os.path.join(os.path.dirname(__file__), "..", "..", "src", "lambda_functions")
-)
-
 from invoice_processor import (
     _extract_amount,
     _extract_date,
     _extract_invoice_number,
     _extract_vendor_name,
+    _matching_patterns,
+    _parse_money,
     _parse_textract_response,
     _call_textract,
     _get_textract_client,
@@ -36,63 +32,38 @@ from invoice_processor import (
 class TestExtractInvoiceNumber:
     """Test invoice number extraction patterns."""
 
-    def test_invoice_hash_pattern(self) -> None:
-        """Should extract from 'Invoice #12345' format."""
-        text = "Invoice #12345 for services rendered"
-        result = _extract_invoice_number(text)
-        assert result == "12345"
-
-    def test_invoice_number_colon(self) -> None:
-        """Should extract from 'Invoice: ABC123' format."""
-        text = "Invoice: ABC123 Date: 2024-01-15"
-        result = _extract_invoice_number(text)
-        assert result == "ABC123"
-
-    def test_inv_prefix(self) -> None:
-        """Should extract from 'INV-12345' format."""
-        text = "Reference: INV98765 Amount Due"
-        result = _extract_invoice_number(text)
-        assert result == "98765"
-
-    def test_invoice_no_period(self) -> None:
-        """Should extract from 'Invoice: 55555' format."""
-        text = "Invoice: 55555 to be paid by"
-        result = _extract_invoice_number(text)
-        assert result == "55555"
-
-    def test_no_invoice_number_found(self) -> None:
-        """Should return empty string when no pattern matches."""
-        text = "Some random text here"
-        result = _extract_invoice_number(text)
-        assert result == ""
-
-    def test_case_insensitive(self) -> None:
-        """Should match case-insensitively."""
-        text = "INVOICE #ABC123 TOTAL"
-        result = _extract_invoice_number(text)
-        assert result == "ABC123"
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("Invoice #12345 for services rendered", "12345"),  # 'Invoice #12345'
+            ("Invoice: ABC123 Date: 2024-01-15", "ABC123"),  # 'Invoice: ABC123'
+            ("Reference: INV98765 Amount Due", "98765"),  # 'INV-12345'
+            ("Invoice: 55555 to be paid by", "55555"),  # 'Invoice: 55555'
+            ("Some random text here", ""),  # no pattern matches
+            ("INVOICE #ABC123 TOTAL", "ABC123"),  # case-insensitive
+        ],
+        ids=["hash", "colon", "inv_prefix", "no_period", "not_found", "case_insensitive"],
+    )
+    def test_extract_invoice_number(self, text: str, expected: str) -> None:
+        """Should extract the invoice number, or '' when no pattern matches."""
+        assert _extract_invoice_number(text) == expected
 
 
 class TestExtractVendorName:
     """Test vendor name extraction patterns."""
 
-    def test_vendor_colon_pattern(self) -> None:
-        """Should extract from 'Vendor: Name' format."""
-        text = "Vendor: Acme Corporation Invoice #12345"
-        result = _extract_vendor_name(text)
-        assert "Acme" in result
-
-    def test_from_pattern(self) -> None:
-        """Should extract from 'From: Name' format."""
-        text = "From: Tech Solutions Inc\nInvoice Date:"
-        result = _extract_vendor_name(text)
-        assert "Tech Solutions" in result
-
-    def test_bill_from_pattern(self) -> None:
-        """Should extract from 'Bill From: Name' format."""
-        text = "Bill From: Office Supplies LLC\nAmount:"
-        result = _extract_vendor_name(text)
-        assert "Office" in result
+    @pytest.mark.parametrize(
+        "text,expected_part",
+        [
+            ("Vendor: Acme Corporation Invoice #12345", "Acme"),
+            ("From: Tech Solutions Inc\nInvoice Date:", "Tech Solutions"),
+            ("Bill From: Office Supplies LLC\nAmount:", "Office"),
+        ],
+        ids=["vendor_colon", "from", "bill_from"],
+    )
+    def test_vendor_patterns(self, text: str, expected_part: str) -> None:
+        """Should extract from 'Vendor:', 'From:' and 'Bill From:' labels."""
+        assert expected_part in _extract_vendor_name(text)
 
     def test_no_vendor_found(self) -> None:
         """Should return 'Unknown Vendor' when no pattern matches."""
@@ -106,33 +77,28 @@ class TestExtractVendorName:
         result = _extract_vendor_name(text)
         assert "  " not in result  # No double spaces
 
+    def test_label_case_insensitive_value_case_kept(self) -> None:
+        """Should match lowercase labels and keep the vendor name's original case."""
+        assert _extract_vendor_name("vendor: McKinsey & Co\ninvoice") == "McKinsey & Co"
+
 
 class TestExtractDate:
     """Test date extraction patterns."""
 
-    def test_mm_dd_yyyy_slash(self) -> None:
-        """Should extract MM/DD/YYYY format."""
-        text = "Invoice Date: 01/15/2024 Amount Due"
-        result = _extract_date(text)
-        assert "01" in result and "15" in result and "2024" in result
-
-    def test_yyyy_mm_dd_dash(self) -> None:
-        """Should extract YYYY-MM-DD format."""
-        text = "Date: 2024-01-15 Vendor:"
+    @pytest.mark.parametrize(
+        "text,expected_parts",
+        [
+            ("Invoice Date: 01/15/2024 Amount Due", ("01", "15", "2024")),  # MM/DD/YYYY
+            ("Date: 2024-01-15 Vendor:", ("2024", "01", "15")),  # YYYY-MM-DD
+            ("Invoice Date: January 15, 2024 Total", ("Jan", "15")),  # Month DD, YYYY
+            ("Amount: $500 12/25/2024 Ref#123", ("12", "25", "2024")),  # standalone
+        ],
+        ids=["mm_dd_yyyy_slash", "yyyy_mm_dd_dash", "month_name", "standalone"],
+    )
+    def test_date_formats(self, text: str, expected_parts: tuple) -> None:
+        """Should extract labelled and standalone dates in each supported format."""
         result = _extract_date(text)
-        assert "2024" in result and "01" in result and "15" in result
-
-    def test_month_name_format(self) -> None:
-        """Should extract 'January 15, 2024' format."""
-        text = "Invoice Date: January 15, 2024 Total"
-        result = _extract_date(text)
-        assert "Jan" in result or "15" in result
-
-    def test_standalone_date(self) -> None:
-        """Should extract standalone date pattern."""
-        text = "Amount: $500 12/25/2024 Ref#123"
-        result = _extract_date(text)
-        assert "12" in result and "25" in result and "2024" in result
+        assert all(part in result for part in expected_parts)
 
     def test_fallback_to_today(self) -> None:
         """Should return today's date when no pattern matches."""
@@ -145,41 +111,50 @@ class TestExtractDate:
 class TestExtractAmount:
     """Test amount extraction patterns."""
 
-    def test_total_dollar_sign(self) -> None:
-        """Should extract from 'Total: $1,234.56' format."""
-        text = "Subtotal: $1000.00 Total: $1,234.56 Thank you"
-        result = _extract_amount(text)
-        assert result == 1000.00  # Extracts first match
-
-    def test_amount_due_pattern(self) -> None:
-        """Should extract from 'Amount Due: $500.00' format."""
-        text = "Balance Amount Due: $500.00"
-        result = _extract_amount(text)
-        assert result == 500.00
-
-    def test_grand_total_pattern(self) -> None:
-        """Should extract from 'Grand Total: 2500.00' format."""
-        text = "Tax: $100 Grand Total: 2500.00"
-        result = _extract_amount(text)
-        assert result == 2500.00
-
-    def test_no_commas(self) -> None:
-        """Should handle amounts without commas."""
-        text = "Total: $5000.99"
-        result = _extract_amount(text)
-        assert result == 5000.99
-
-    def test_standalone_currency(self) -> None:
-        """Should extract standalone currency amounts."""
-        text = "Please pay $750.00 by end of month"
-        result = _extract_amount(text)
-        assert result == 750.00
-
-    def test_no_amount_found(self) -> None:
-        """Should return 0.0 when no amount found."""
-        text = "Invoice with no amounts listed"
-        result = _extract_amount(text)
-        assert result == 0.0
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("Subtotal: $1000.00 Total: $1,234.56 Thank you", 1000.00),  # Extracts first match
+            ("Balance Amount Due: $500.00", 500.00),
+            ("Tax: $100 Grand Total: 2500.00", 2500.00),
+            ("Total: $5000.99", 5000.99),  # no commas
+            ("Please pay $750.00 by end of month", 750.00),  # standalone currency
+            ("Invoice with no amounts listed", 0.0),  # nothing found
+        ],
+        ids=["total_dollar_sign", "amount_due", "grand_total", "no_commas", "standalone", "not_found"],
+    )
+    def test_extract_amount(self, text: str, expected: float) -> None:
+        """Should extract the total amount, or 0.0 when none is found."""
+        assert _extract_amount(text) == expected
+
+    @pytest.mark.parametrize(
+        "value,expected",
+        [("1,234.56", 1234.56), ("5000.99", 5000.99), ("750", 750.0), (",", None)],
+    )
+    def test_parse_money(self, value: str, expected) -> None:
+        """Should strip thousands separators and reject matches with no digits."""
+        assert _parse_money(value) == expected
+
+
+class TestUnicodeWhitespace:
+    """Test non-ASCII whitespace from Textract is treated like a space."""
+
+    @pytest.mark.parametrize(
+        "extract,text,expected",
+        [
+            (_extract_invoice_number, "Invoice\u00a0#\u00a0INV-001", "INV-001"),
+            (_extract_vendor_name, "Vendor:\u00a0Acme\u2009Corp\n", "Acme Corp"),
+            (_extract_date, "Date:\u202f2024-01-15", "2024-01-15"),
+            (_extract_date, "Dated Jan\u00a015,\u3000 2024", "Jan 15,  2024"),
+            (_extract_amount, "Grand\u00a0Total:\u00a0$1,234.56", 1234.56),
+            (_extract_date, "Dated\x1c01/15/2024", "01/15/2024"),
+            (_extract_vendor_name, "Vendor \x1c Acme\n", "Acme"),
+        ],
+        ids=["invoice_number", "vendor", "iso_date", "month_date", "amount", "sep_date", "sep_vendor"],
+    )
+    def test_non_ascii_whitespace(self, extract, text: str, expected) -> None:
+        """Should match NBSP, thin, ideographic and \\x1c-\\x1f spaces wherever \\s is allowed."""
+        assert extract(text, _matching_patterns(text)) == expected
 
 
 class TestParseTextractResponse:
@@ -205,6 +180,16 @@ class TestParseTextractResponse:
         assert result["amount"] == 1500.00
         assert result["category"] == "Other"  # Default
 
+    def test_prefilter_does_not_change_results(self) -> None:
+        """Should extract the same fields with and without the pattern-set prefilter."""
+        pytest.importorskip("re2")
+        text = "Invoice #12345 From: Acme Corp\n Date: 2024-01-15 Subtotal: $1000.00 Total: $1,500.00"
+        candidates = _matching_patterns(text)
+        assert candidates is not None
+
+        for extract in (_extract_invoice_number, _extract_vendor_name, _extract_date, _extract_amount):
+            assert extract(text, candidates) == extract(text)
+
     def test_parse_empty_response(self) -> None:
         """Should handle empty response gracefully."""
         response = {"Blocks": []}
@@ -284,8 +269,6 @@ class TestExcelValidation:
 
     def test_required_columns_present(self) -> None:
         """Should validate that required columns are present."""
-        import pandas as pd
-
         REQUIRED_COLUMNS = ["Date", "Vendor", "Amount", "Category"]
         df = pd.DataFrame({
             "Date": ["2024-01-15"],
@@ -294,13 +277,12 @@ class TestExcelValidation:
             "Category": ["Inventory"],
         })
 
-        missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        required = pd.Index(REQUIRED_COLUMNS)
+        missing = required[~required.isin(df.columns)].tolist()
         assert missing == []
 
     def test_missing_columns_detected(self) -> None:
         """Should detect missing columns."""
-        import pandas as pd
-
         REQUIRED_COLUMNS = ["Date", "Vendor", "Amount", "Category"]
         df = pd.DataFrame({
             "Date": ["2024-01-15"],
@@ -308,15 +290,15 @@ class TestExcelValidation:
             # Missing 'Amount' and 'Category'
         })
 
-        missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        required = pd.Index(REQUIRED_COLUMNS)
+        missing = required[~required.isin(df.columns)].tolist()
         assert "Amount" in missing
         assert "Category" in missing
 
     def test_extra_columns_ignored(self) -> None:
         """Extra columns should be identified but not cause errors."""
-        import pandas as pd
-
         REQUIRED_COLUMNS = ["Date", "Vendor", "Amount", "Category"]
+        REQUIRED_COLUMN_SET = frozenset(REQUIRED_COLUMNS)
         df = pd.DataFrame({
             "Date": ["2024-01-15"],
             "Vendor": ["Acme"],
@@ -326,8 +308,9 @@ class TestExcelValidation:
             "AnotherExtra": [123],
         })
 
-        missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
-        extra = [col for col in df.columns if col not in REQUIRED_COLUMNS]
+        required = pd.Index(REQUIRED_COLUMNS)
+        missing = required[~required.isin(df.columns)].tolist()
+        extra = [col for col in df.columns if col not in REQUIRED_COLUMN_SET]
 
         assert missing == []
         assert "ExtraColumn" in extra